@@ -0,0 +1,275 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author  : wudizhangzhi
+"""
+Params 装饰器的性能测试
+
+测量每个请求的校验开销(微秒), 覆盖:
+    参数个数 1 / 10 / 50
+    类型 int / float / bool / str / choices / DATETIME_STR
+    many=True 的列表长度 10 ~ 100000
+    GET 和 POST 的参数获取
+    _memoize 命中缓存时的开销
+    import django_params_validator 的时间(import, 新的解释器中测量)
+
+    python benchmarks/bench.py                     # 运行并和 baseline.json 比较, 变慢超过阈值时退出码为 1
+    python benchmarks/bench.py --update-baseline   # 用本次结果更新 baseline.json
+    python benchmarks/bench.py -k many             # 只运行名字包含 many 的用例
+
+结果写入 --output 指定的 json 文件.
+
+baseline 是在某一台机器上测量的. 每次运行同时测量一段固定的纯 Python 代码(calibration),
+比较之前按 calibration 的比值把 baseline 换算成本机的速度; 校验的代码变慢, 即使所有用例一起变慢, 也会报告.
+比换算后的 baseline 慢 THRESHOLD 倍以上, 并且超过 NOISE_FLOOR 微秒时才算退化;
+看起来变慢的用例重新测量 RETRIES 次, 取最小值, 单次测量的抖动不会导致失败.
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import timeit
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+from django.conf import settings
+
+if not settings.configured:
+    settings.configure()
+
+from django_params_validator import Params
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+BASELINE = os.path.join(HERE, 'baseline.json')
+OUTPUT = os.path.join(HERE, 'results.json')
+# 比 baseline 慢多少倍算退化
+THRESHOLD = 1.5
+# 变慢的绝对值(微秒)小于此值时当作噪声
+NOISE_FLOOR = 1.0
+# 看起来变慢的用例重新测量的次数
+RETRIES = 3
+CALIBRATION = 'calibration'
+# 和校验类似的操作: 查找 dict, 转换字符串, 比较
+CALIBRATION_CODE = '''
+data = {}
+for i in range(100):
+    data['p%d' % i] = str(i)
+total = 0
+for key in data:
+    value = int(data[key])
+    if value >= 0:
+        total += value
+'''
+
+
+class ListDict(dict):
+    def getlist(self, key, default=None):
+        value = self.get(key)
+        if value is None:
+            return default
+        return value if isinstance(value, list) else [value]
+
+
+class Req(object):
+    method = 'GET'
+
+
+class FakeR(object):
+    def __init__(self, method, get=None, post=None):
+        self.GET = ListDict(get or {})
+        self.data = post or {}
+        self._request = Req()
+        self._request.method = method
+
+
+def view(request, *args, **kwargs):
+    return kwargs
+
+
+def case_params_count(n, method):
+    spec = {}
+    data = {}
+    for i in range(n):
+        spec['p%d' % i] = int
+        spec['p%d__gte' % i] = 0
+        data['p%d' % i] = str(i) if method == 'GET' else i
+    return spec, method, data
+
+
+def case_type(param_type, value, **options):
+    spec = dict(p=param_type, **dict(('p__%s' % k, v) for k, v in options.items()))
+    return spec, 'GET', {'p': value}
+
+
+def case_memoize(n):
+    spec, method, data = case_params_count(n, 'GET')
+    spec['_memoize'] = True
+    return spec, method, data
+
+
+def case_many(size, method):
+    spec = dict(ids=int, ids__many=True)
+    return spec, method, {'ids': [str(i) for i in range(size)]}
+
+
+def case_csv(size, **options):
+    spec = dict(ids=int, ids__many=True, **dict(('ids__%s' % k, v) for k, v in options.items()))
+    return spec, 'GET', {'ids': ','.join(str(i) for i in range(size))}
+
+
+CASES = {
+    'count_1_get': case_params_count(1, 'GET'),
+    'count_10_get': case_params_count(10, 'GET'),
+    'count_50_get': case_params_count(50, 'GET'),
+    'count_10_post': case_params_count(10, 'POST'),
+    'type_int': case_type(int, '100'),
+    'type_float': case_type(float, '100.5'),
+    'type_bool': case_type(bool, 'true'),
+    'type_str': case_type(str, 'hello', lte=10),
+    'type_choices': case_type(('red', 'green', 'blue'), 'blue'),
+    'type_datetime': case_type(Params.DATETIME_STR, '2018-10-10 08:00:00'),
+    'type_date': case_type(Params.DATETIME_STR, '2018-10-10', format='%Y-%m-%d'),
+    'memoize_10_get': case_memoize(10),
+    'memoize_50_get': case_memoize(50),
+    'many_10_get': case_many(10, 'GET'),
+    'many_1000_get': case_many(1000, 'GET'),
+    'many_csv_1000_get': case_csv(1000),
+    'many_csv_1000_array_get': case_csv(1000, array=True),
+    'many_10_post': case_many(10, 'POST'),
+    'many_1000_post': case_many(1000, 'POST'),
+    'many_100000_post': case_many(100000, 'POST'),
+}
+
+
+def measure(spec, method, data, compile_=True, repeat=5):
+    """ 返回每次调用的最短耗时(微秒) """
+    wrapped = Params(_compile=compile_, **spec)(view)
+    request = FakeR(method, get=data if method == 'GET' else None, post=data if method != 'GET' else None)
+    wrapped(request)
+    timer = timeit.Timer(lambda: wrapped(request))
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+
+
+IMPORT_CODE = '\n'.join([
+    'from time import perf_counter',
+    'start = perf_counter()',
+    'import django_params_validator',
+    'print(perf_counter() - start)',
+])
+
+
+def measure_import(repeat=5):
+    """ 在新的解释器中导入包的最短耗时(微秒), 和部署时一样使用编译好的 .pyc """
+    import tempfile
+    env = dict(os.environ)
+    env.pop('PYTHONDONTWRITEBYTECODE', None)
+    with tempfile.TemporaryDirectory() as prefix:
+        command = [sys.executable, '-X', 'pycache_prefix=' + prefix, '-c', IMPORT_CODE]
+        # 第一次运行写入 .pyc
+        subprocess.check_output(command, cwd=ROOT, env=env)
+        times = [float(subprocess.check_output(command, cwd=ROOT, env=env)) for _ in range(repeat)]
+    return min(times) * 1e6
+
+
+def calibrate(repeat=5):
+    """ CALIBRATION_CODE 的最短耗时(微秒) """
+    timer = timeit.Timer(CALIBRATION_CODE)
+    number, _ = timer.autorange()
+    return min(timer.repeat(repeat=repeat, number=number)) / number * 1e6
+
+
+def measure_case(name):
+    """ 按 results 中的名字测量一个用例 """
+    if name == CALIBRATION:
+        return calibrate()
+    if name == 'import':
+        return measure_import()
+    compile_ = not name.endswith('_interpreted')
+    spec, method, data = CASES[name if compile_ else name[:-len('_interpreted')]]
+    return measure(spec, method, data, compile_=compile_)
+
+
+def run(keyword=None, interpreted=False):
+    names = [CALIBRATION]
+    if not keyword or keyword in 'import':
+        names.append('import')
+    for name in sorted(CASES):
+        if keyword and keyword not in name:
+            continue
+        names.append(name)
+        if interpreted:
+            names.append(name + '_interpreted')
+    results = dict((name, measure_case(name)) for name in names)
+    # 用例之前和之后各测量一次, 取最小值
+    results[CALIBRATION] = min(results[CALIBRATION], calibrate())
+    return results
+
+
+def speed_ratio(results, baseline):
+    """ 本机相对于测量 baseline 的机器慢多少倍: calibration 的比值 """
+    if results.get(CALIBRATION) and baseline.get(CALIBRATION):
+        return results[CALIBRATION] / baseline[CALIBRATION]
+    return 1.0
+
+
+def compare(results, baseline, threshold=THRESHOLD, noise_floor=NOISE_FLOOR):
+    """ 返回变慢超过阈值的用例 [(name, result, 换算到本机的 baseline)] """
+    ratio = speed_ratio(results, baseline)
+    regressions = []
+    for name, value in sorted(results.items()):
+        if name == CALIBRATION or name not in baseline:
+            continue
+        base = baseline[name] * ratio
+        if value > base * threshold and value - base > noise_floor:
+            regressions.append((name, value, base))
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-k', dest='keyword', help='只运行名字包含该字符串的用例')
+    parser.add_argument('--output', default=OUTPUT)
+    parser.add_argument('--baseline', default=BASELINE)
+    parser.add_argument('--threshold', type=float, default=THRESHOLD)
+    parser.add_argument('--noise-floor', type=float, default=NOISE_FLOOR, help='微秒')
+    parser.add_argument('--retries', type=int, default=RETRIES, help='看起来变慢的用例重新测量的次数')
+    parser.add_argument('--interpreted', action='store_true', help='同时测量 _compile=False')
+    parser.add_argument('--update-baseline', action='store_true')
+    args = parser.parse_args(argv)
+
+    results = run(args.keyword, args.interpreted)
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+    regressions = compare(results, baseline, args.threshold, args.noise_floor)
+    for _ in range(0 if args.update_baseline else args.retries):
+        if not regressions:
+            break
+        for name, _, _ in regressions:
+            results[name] = min(results[name], measure_case(name))
+        regressions = compare(results, baseline, args.threshold, args.noise_floor)
+    with open(args.output, 'w') as f:
+        json.dump(results, f, indent=2, sort_keys=True)
+
+    ratio = speed_ratio(results, baseline)
+    print('speed ratio to the baseline machine: %.2f' % ratio)
+    for name, value in sorted(results.items()):
+        print('%-32s %12.2f us  (baseline %s)' % (
+            name, value, '%.2f' % (baseline[name] * ratio) if name in baseline else '-'))
+
+    if args.update_baseline:
+        baseline.update(results)
+        with open(args.baseline, 'w') as f:
+            json.dump(baseline, f, indent=2, sort_keys=True)
+        return 0
+
+    for name, value, base in regressions:
+        print('REGRESSION %s: %.2f us > %.2f us * %s' % (name, value, base, args.threshold), file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
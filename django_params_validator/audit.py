@@ -0,0 +1,136 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author  : wudizhangzhi
+"""
+检查 Params 的声明并测量校验耗时, 由 warmup.py 和 manage.py warmup_params 使用
+
+    report = audit(Params(page=int, page__gte=1, ordering=('name', 'created')))
+    report.problems     # ['page: sample 0 rejected: ...']
+    report.seconds      # 校验一组示例参数的耗时
+
+对每个参数按声明生成一个示例值(default, 第一个选项, 或者满足取值范围的值),
+校验不通过说明声明自相矛盾, 例如 default 不在选项内, gt 大于 lt.
+model, 自定义 validator, ChoiceSource 和流式读取的参数不生成示例值, 不会查询数据库或者读取文件.
+这里不依赖 Django.
+"""
+import math
+import timeit
+from collections import namedtuple
+from datetime import datetime
+
+from .choices import ChoiceSource
+from .datetimes import ISO_FORMAT
+
+Report = namedtuple('Report', ['endpoint', 'route', 'params', 'compiled', 'problems', 'seconds'])
+
+# 测量耗时时校验的次数
+DEFAULT_NUMBER = 1000
+SAMPLE_DATETIME = datetime(2018, 10, 10, 8, 0, 0)
+# 无法生成示例值
+NO_SAMPLE = object()
+
+
+def sample_value(validator, params_cls):
+    """ 满足声明的一个示例值, 不能生成时返回 NO_SAMPLE """
+    if validator.model is not None or validator.validator is not None or validator.stream or \
+            isinstance(validator.choices, ChoiceSource):
+        return NO_SAMPLE
+    if validator.default is not None:
+        return validator.default
+    if not validator.many:
+        return sample_item(validator, params_cls, validator.gt, validator.gte, validator.lt, validator.lte)
+    item = sample_item(validator, params_cls,
+                       validator.item_gt, validator.item_gte, validator.item_lt, validator.item_lte)
+    if item is NO_SAMPLE:
+        return NO_SAMPLE
+    return [item] * sample_size(validator.gt, validator.gte, validator.lt, validator.lte)
+
+
+def sample_item(validator, params_cls, gt, gte, lt, lte):
+    param_type = validator.param_type
+    if validator.choices:
+        return next(iter(validator.choices))
+    if validator.eq is not None:
+        return validator.eq
+    if param_type == params_cls.DATETIME_STR:
+        if validator.format == ISO_FORMAT:
+            return SAMPLE_DATETIME.isoformat()
+        return SAMPLE_DATETIME.strftime(validator.format)
+    if param_type is bool:
+        return True
+    if param_type is float and None not in (gt if gte is None else gte, lt if lte is None else lte):
+        # 两边都有范围时取中点
+        return ((gt if gte is None else gte) + (lt if lte is None else lte)) / 2.0
+    if param_type in (int, float):
+        return param_type(sample_size(gt, gte, lt, lte, minimum=None))
+    if param_type in (str, None):
+        return 'x' * sample_size(gt, gte, lt, lte)
+    return NO_SAMPLE
+
+
+def sample_size(gt, gte, lt, lte, minimum=0):
+    """ 满足范围的最小整数, 没有下限时为 1 或者满足上限的最大整数 """
+    if gte is not None:
+        value = math.ceil(gte)
+    elif gt is not None:
+        value = math.floor(gt) + 1
+    elif lte is not None:
+        value = min(1, math.floor(lte))
+    elif lt is not None:
+        value = min(1, math.ceil(lt) - 1)
+    else:
+        value = 1
+    if minimum is not None:
+        value = max(value, minimum)
+    return value
+
+
+def sample_data(params):
+    """ {参数名: 示例值}, 以及不能生成示例值的参数名 """
+    data = {}
+    skipped = []
+    for validator in params._validators.values():
+        value = sample_value(validator, type(params))
+        if value is NO_SAMPLE:
+            skipped.append(validator.param_name)
+        else:
+            data[validator.param_name] = value
+    return data, skipped
+
+
+def audit(params, route=None, number=DEFAULT_NUMBER):
+    """ 构造(编译) params, 检查声明并测量校验一组示例参数的耗时, 返回 Report; number=0 时不测量, seconds 为 None """
+    try:
+        params.build()
+    except (TypeError, ValueError) as e:
+        names = set(k.split(params.split_str, 1)[0] for k in params._params)
+        return Report(params.name, route, len(names), False, ['build failed: %s' % e], None)
+    problems = []
+    compiled = params._compiled is not None
+    if params._options['compile'] and not compiled:
+        problems.append('compile failed, falling back to the interpreter')
+    data, skipped = sample_data(params)
+    # 逐个参数校验, 不可能生成示例值的参数不参与, 也不运行 finish(查询 model, 自定义 validator)
+    checks = [(validator, check) for validator, check in params.param_checks()
+              if validator.param_name not in skipped]
+    rejected = False
+    for validator, check in checks:
+        try:
+            check(data, False, {})
+        except params.error_class as e:
+            problems.append('%s: sample %r rejected: %s' % (validator.param_name, data[validator.param_name],
+                                                            e.message))
+            rejected = True
+    if params._compiled is not None and not skipped:
+        def run():
+            params._compiled(data, False, {})
+    else:
+        def run():
+            kwargs = {}
+            for _, check in checks:
+                check(data, False, kwargs)
+    seconds = None
+    if not rejected and number > 0:
+        seconds = timeit.timeit(run, number=number) / number
+    return Report(params.name, route, len(params._validators) + (params._stream is not None),
+                  compiled, problems, seconds)
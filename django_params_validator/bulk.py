@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author  : wudizhangzhi
+"""
+批量校验: Params.validate_many 的进程池实现
+
+编译好的校验函数不能 pickle, 所以发给子进程的是 Params 的声明, 每个分块在子进程里重新构造 Params.
+子进程里使用纯 python 的 core.Params, 不需要导入或配置 Django.
+"""
+from concurrent.futures import ProcessPoolExecutor
+
+DEFAULT_CHUNK_SIZE = 10000
+
+
+def validate_chunk(params_cls, spec, records):
+    return params_cls(**spec).validate_many(records)
+
+
+def validate_in_pool(params, records, chunk_size=None, max_workers=None, executor=None):
+    records = list(records)
+    chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+    chunks = [records[i:i + chunk_size] for i in range(0, len(records), chunk_size)]
+    params_cls, spec = params._pool_params()
+
+    own_executor = executor is None
+    if own_executor:
+        executor = ProcessPoolExecutor(max_workers=max_workers)
+    try:
+        futures = [executor.submit(validate_chunk, params_cls, spec, chunk) for chunk in chunks]
+        results = []
+        for future in futures:
+            results.extend(future.result())
+        return results
+    finally:
+        if own_executor:
+            executor.shutdown()
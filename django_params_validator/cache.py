@@ -0,0 +1,206 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author  : wudizhangzhi
+"""
+校验结果的缓存
+
+_memoize: 以 GET 请求中声明过的参数的原始值为 key, 缓存转换后的 kwargs(包括默认值)
+
+    params = Params(page=int, page__default=1, ordering=('name', '-name'), _memoize=1024)
+    params.memo_info()  # CacheInfo(hits=..., misses=..., maxsize=1024, currsize=...)
+
+包含 model, stream, 自定义的 validator, ndarray, array 或者会刷新的 ChoiceSource 的声明不会缓存.
+
+canonical_key: 校验后的参数的稳定 hash, 参数顺序, 空值, '0'/'false' 等写法不同的等价请求得到同样的 key
+
+xx__cache_ttl: 缓存自定义 validator 对每个值的结果(通过时的新值, 不通过时的错误信息), 见 validators.py
+    TTLCache 在进程内按 LRU 淘汰, xx__cache_backend 指定 Django cache 时在多个进程之间共享
+"""
+import threading
+from collections import OrderedDict, namedtuple
+from time import monotonic
+
+from .choices import ChoiceSource
+from .sources import BODY
+
+CacheInfo = namedtuple('CacheInfo', ['hits', 'misses', 'maxsize', 'currsize'])
+
+DEFAULT_MEMO_SIZE = 1024
+# xx__cache_size 的默认值
+DEFAULT_RESULT_CACHE_SIZE = 1024
+# 没有指定 xx__cache_negative_ttl 时, 不通过的结果缓存 cache_ttl 的几分之一
+NEGATIVE_TTL_RATIO = 10
+MISSING = object()
+
+
+class LRUCache(object):
+    """ 线程安全的 LRU 缓存 """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.data = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                value = self.data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self.data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            self.data[key] = value
+            self.data.move_to_end(key)
+            if len(self.data) > self.maxsize:
+                self.data.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.data.clear()
+            self.hits = self.misses = 0
+
+    def info(self):
+        with self.lock:
+            return CacheInfo(self.hits, self.misses, self.maxsize, len(self.data))
+
+
+class TTLCache(LRUCache):
+    """ 每个值有过期时间的 LRU 缓存 """
+
+    def get(self, key, default=None):
+        with self.lock:
+            try:
+                expires, value = self.data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            if expires <= monotonic():
+                del self.data[key]
+                self.misses += 1
+                return default
+            self.data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value, ttl=None):
+        super(TTLCache, self).set(key, (monotonic() + ttl, value))
+
+
+class DjangoCache(object):
+    """ 使用 Django 的 cache, 多个进程共享; key 是 prefix 加值的 hash """
+
+    def __init__(self, alias, prefix):
+        self.alias = alias
+        self.prefix = prefix
+
+    def key(self, key):
+        import hashlib
+        return '%s:%s' % (self.prefix, hashlib.sha1(repr(key).encode('utf-8')).hexdigest())
+
+    def get(self, key, default=None):
+        from django.core.cache import caches
+        return caches[self.alias].get(self.key(key), default)
+
+    def set(self, key, value, ttl=None):
+        from django.core.cache import caches
+        caches[self.alias].set(self.key(key), value, ttl)
+
+
+def result_cache(validator):
+    """ 按 validator 的 cache_* 属性创建缓存 """
+    if validator.cache_backend:
+        func = validator.validator
+        prefix = validator.cache_key_prefix
+        if prefix is None:
+            qualname = getattr(func, '__qualname__', repr(func))
+            if '<lambda>' in qualname:
+                # 不同的 lambda 的 qualname 相同, 会读到彼此的结果
+                raise TypeError('%s: a lambda validator with cache_backend needs cache_key_prefix'
+                                % validator.param_name)
+            prefix = '%s.%s:%s' % (getattr(func, '__module__', ''), qualname, validator.param_name)
+        return DjangoCache(validator.cache_backend, 'params_validator:' + prefix)
+    return TTLCache(validator.cache_size or DEFAULT_RESULT_CACHE_SIZE)
+
+
+def negative_ttl(validator):
+    if validator.cache_negative_ttl is not None:
+        return validator.cache_negative_ttl
+    return validator.cache_ttl / NEGATIVE_TTL_RATIO
+
+
+def memoizable(params):
+    """ 转换后的参数只由原始值决定, 并且可以在请求之间共享 """
+    if params._models or params._custom or params._stream is not None:
+        return False
+    if params._sources is not None and params._sources.needed & {None, BODY}:
+        # 按来源获取参数时 is_get 总是 True, 不缓存请求体中的参数
+        return False
+    for validator in params._validators.values():
+        if validator.ndarray or validator.array or isinstance(validator.choices, ChoiceSource):
+            return False
+    return True
+
+
+def memoized_validate(params, validate, cache):
+    """ 返回替换 params.validate 的函数, 只缓存 GET 请求的成功结果 """
+    names = [(validator.param_name, validator.many) for validator in params._validators.values()]
+    null_values = params.NULL_VALUE_LIST
+
+    def memo_validate(request_data, is_get=False, kwargs=None, identity_cache=None):
+        if kwargs is None:
+            kwargs = {}
+        if not is_get:
+            return validate(request_data, is_get, kwargs, identity_cache)
+        key = []
+        for name, many in names:
+            if many:
+                key.append(tuple(i for i in request_data.getlist(name, []) if i not in null_values))
+            else:
+                value = request_data.get(name)
+                key.append(None if value in null_values else value)
+        key = tuple(key)
+        try:
+            result = cache.get(key, MISSING)
+        except TypeError:  # 原始值不能 hash
+            return validate(request_data, is_get, kwargs, identity_cache)
+        if result is MISSING:
+            result = validate(request_data, is_get, {}, identity_cache)
+            result = tuple((k, tuple(v) if isinstance(v, list) else v) for k, v in result.items())
+            cache.set(key, result)
+        for k, v in result:
+            kwargs[k] = list(v) if isinstance(v, tuple) else v
+        return kwargs
+
+    return memo_validate
+
+
+def _canonical_default(value):
+    import datetime
+    from decimal import Decimal
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    if hasattr(value, '_meta') and hasattr(value, 'pk'):  # model 实例
+        return value.pk
+    if isinstance(value, (set, frozenset)):
+        return sorted(value, key=repr)
+    if hasattr(value, 'tolist'):
+        # numpy.ndarray / array.array; str(ndarray) 省略超过 1000 个元素的中间部分
+        return value.tolist()
+    return str(value)
+
+
+def canonical_key(data):
+    """ dict 或 DRF response.data 的稳定 hash(sha1 hex) """
+    import hashlib
+    import json
+    text = json.dumps(data, sort_keys=True, separators=(',', ':'), default=_canonical_default)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
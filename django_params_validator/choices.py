@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author  : wudizhangzhi
+"""
+选项(choices)的索引和延迟加载的选项来源
+
+静态的选项在装饰时建立 frozenset 索引, 判断是否在选项内是 O(1).
+
+选项很多或者会变化时, 用 ChoiceSource 在第一次使用时加载, 可以按 ttl 秒刷新:
+
+    @Params(region=ChoiceSource(load_region_ids, ttl=600, param_type=int))
+    @Params(sku=ChoiceSource.from_file('/etc/app/skus.txt'))
+    @Params(sku=str, sku__choices=load_skus)            # callable 自动包装成 ChoiceSource
+
+指定 snapshot 文件时, 加载的选项写成排好序的定长记录文件, 各个进程(例如 gunicorn worker)
+只读地 mmap 同一个文件并二分查找, 每个进程不再保存一份选项集合:
+
+    ChoiceSource(load_skus, ttl=600, snapshot='/dev/shm/skus.choices')
+
+snapshot 按 str(value) 比较, 适用于 str 和 int 的选项.
+"""
+import os
+import struct
+import threading
+from time import monotonic, time
+
+
+def build_index(choices):
+    """ 返回用于判断 value in index 的对象 """
+    if isinstance(choices, ChoiceSource):
+        return choices
+    try:
+        return frozenset(choices)
+    except TypeError:  # 选项中有不能 hash 的值
+        return choices
+
+
+def contains(index, value):
+    try:
+        return value in index
+    except TypeError:  # value 不能 hash, 不可能在 frozenset 中
+        return False
+
+
+class ChoiceSource(object):
+    """
+    延迟加载的选项
+    loader: 无参数的 callable, 返回所有选项
+    ttl: 加载后多少秒重新加载, None 表示不刷新
+    param_type: 参数的类型, 参数在判断选项之前先转换成该类型
+    snapshot: 共享的快照文件路径, 见 SnapshotIndex
+    """
+
+    def __init__(self, loader, ttl=None, param_type=str, snapshot=None):
+        self.loader = loader
+        self.ttl = ttl
+        self.param_type = param_type
+        self.snapshot = snapshot
+        self._index = None
+        self._loaded_at = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_file(cls, path, ttl=None, param_type=str, snapshot=None):
+        """ 每行一个选项的文本文件 """
+
+        def load():
+            with open(path, encoding='utf-8') as f:
+                return [param_type(line.strip()) for line in f if line.strip()]
+
+        return cls(load, ttl, param_type, snapshot)
+
+    def expired(self):
+        return self._index is None or (self.ttl is not None and monotonic() - self._loaded_at >= self.ttl)
+
+    def index(self):
+        if self.expired():
+            with self._lock:
+                if self.expired():
+                    self._index = self.load()
+                    self._loaded_at = monotonic()
+        return self._index
+
+    def load(self):
+        if self.snapshot:
+            return SnapshotIndex.open_or_create(self.snapshot, self.loader, self.ttl)
+        return frozenset(self.loader())
+
+    def refresh(self):
+        """ 强制重新加载 """
+        with self._lock:
+            if self.snapshot:
+                SnapshotIndex.create(self.snapshot, self.loader)
+            self._index = self.load()
+            self._loaded_at = monotonic()
+
+    def __contains__(self, value):
+        return contains(self.index(), value)
+
+    def __iter__(self):
+        return iter(self.index())
+
+    def __len__(self):
+        return len(self.index())
+
+    def __bool__(self):
+        # 不因为判断真假而加载
+        return True
+
+    def __repr__(self):
+        return '<ChoiceSource: %s>' % getattr(self.loader, '__name__', self.loader)
+
+
+class SnapshotIndex(object):
+    """
+    只读 mmap 的选项快照文件
+    格式: MAGIC, 记录长度, 记录个数, 然后是排好序的定长记录(utf-8, 用 \\0 补齐)
+    """
+    MAGIC = b'DPV-CHOICES\n'
+    HEADER = struct.Struct('<II')
+
+    def __init__(self, path):
+        import mmap
+        with open(path, 'rb') as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        if self.mm[:len(self.MAGIC)] != self.MAGIC:
+            raise ValueError('%s is not a choices snapshot' % path)
+        self.width, self.count = self.HEADER.unpack_from(self.mm, len(self.MAGIC))
+        self.offset = len(self.MAGIC) + self.HEADER.size
+
+    @classmethod
+    def create(cls, path, loader):
+        """ 加载选项并写入快照, 先写临时文件再替换, 正在读旧文件的进程不受影响 """
+        import tempfile
+        keys = sorted(set(str(v).encode('utf-8') for v in loader()))
+        width = max(len(k) for k in keys) if keys else 1
+        directory = os.path.dirname(os.path.abspath(path))
+        fd, tmp = tempfile.mkstemp(dir=directory, prefix='.choices-')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(cls.MAGIC)
+                f.write(cls.HEADER.pack(width, len(keys)))
+                for key in keys:
+                    f.write(key.ljust(width, b'\0'))
+            os.replace(tmp, path)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    @classmethod
+    def open_or_create(cls, path, loader, ttl=None):
+        """ 快照不存在或者超过 ttl 秒时重新生成, 否则直接使用其它进程生成的快照 """
+        try:
+            age = time() - os.stat(path).st_mtime
+        except OSError:
+            age = None
+        if age is None or (ttl is not None and age >= ttl):
+            cls.create(path, loader)
+        return cls(path)
+
+    def record(self, i):
+        start = self.offset + i * self.width
+        return self.mm[start:start + self.width]
+
+    def __contains__(self, value):
+        key = str(value).encode('utf-8')
+        if len(key) > self.width:
+            return False
+        key = key.ljust(self.width, b'\0')
+        lo, hi = 0, self.count
+        while lo < hi:
+            mid = (lo + hi) // 2
+            record = self.record(mid)
+            if record < key:
+                lo = mid + 1
+            elif record > key:
+                hi = mid
+            else:
+                return True
+        return False
+
+    def __iter__(self):
+        for i in range(self.count):
+            yield self.record(i).rstrip(b'\0').decode('utf-8')
+
+    def __len__(self):
+        return self.count
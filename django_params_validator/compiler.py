@@ -0,0 +1,347 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author  : wudizhangzhi
+"""
+把 Params 的参数声明编译成一个专用的校验函数
+
+解释执行时每个请求都要遍历 validators, 重复判断 many / bool / int / choices / lt ...
+这里在装饰时根据声明生成 python 源码并 exec 一次, 生成的函数只包含该声明需要的检查:
+
+    def validate(request_data, is_get, kwargs):
+        value = request_data.get('page', None)
+        ...
+        kwargs['page'] = value
+        return kwargs
+
+无法编译的声明抛出 CompileError, 由调用方退回解释执行.
+"""
+try:
+    from collections.abc import Sized
+except ImportError:  # python2
+    from collections import Sized
+
+from .choices import build_index
+from .errors import (MISSING, TYPE, CHOICES, RANGE, DATETIME, LIMIT,
+                     MISSING_MSG, ITERABLE_MSG, TYPE_MSG, CHOICES_MSG, DATETIME_MSG, RANGE_MSGS,
+                     MAX_LENGTH_MSG, MAX_ITEMS_MSG)
+
+
+class CompileError(Exception):
+    pass
+
+
+class CodeWriter(object):
+    INDENT = '    '
+
+    def __init__(self):
+        self.lines = []
+        self.level = 0
+
+    def line(self, code):
+        self.lines.append(self.INDENT * self.level + code)
+
+    def indent(self):
+        self.level += 1
+
+    def dedent(self):
+        self.level -= 1
+
+    def source(self):
+        return '\n'.join(self.lines) + '\n'
+
+
+class ValidatorCompiler(object):
+    """
+    根据一组 ParamValidator 生成校验函数
+    常量(默认值, 选项, 类型, 错误类)通过命名空间传入生成的代码, 不使用 repr 拼接
+    """
+    func_name = 'validate'
+
+    def __init__(self, validators, params_cls, error_cls):
+        self.validators = list(validators)
+        self.params_cls = params_cls
+        self.namespace = {
+            '_Error': error_cls,
+            '_MISSING_MSG': MISSING_MSG,
+            '_ITERABLE_MSG': ITERABLE_MSG,
+            '_TYPE_MSG': TYPE_MSG,
+            '_CHOICES_MSG': CHOICES_MSG,
+            '_DATETIME_MSG': DATETIME_MSG,
+            '_RANGE_MSGS': RANGE_MSGS,
+            '_MAX_LENGTH_MSG': MAX_LENGTH_MSG,
+            '_MAX_ITEMS_MSG': MAX_ITEMS_MSG,
+            '_NULL': params_cls.NULL_VALUE_LIST,
+            '_is_iterable': params_cls.is_iterable,
+            '_Sized': Sized,
+            '_split_values': params_cls.split_values,
+            '_BOOL_STRS': ('0', '1', 'true', 'false'),
+            '_FALSE_STRS': ('0', 'false'),
+        }
+        self.writer = CodeWriter()
+
+    def const(self, name, index, value):
+        key = '_%s_%d' % (name, index)
+        self.namespace[key] = value
+        return key
+
+    def compile(self):
+        w = self.writer
+        w.line('def %s(request_data, is_get, kwargs):' % self.func_name)
+        w.indent()
+        for index, validator in enumerate(self.validators):
+            self.write_validator(index, validator)
+        w.line('return kwargs')
+        w.dedent()
+        return self.build('<params %s>' % ', '.join(v.param_name for v in self.validators))
+
+    def build(self, filename):
+        source = self.writer.source()
+        try:
+            code = compile(source, filename, 'exec')
+        except SyntaxError as e:
+            raise CompileError(str(e))
+        exec(code, self.namespace)
+        func = self.namespace[self.func_name]
+        func.source = source
+        return func
+
+    def write_validator(self, index, validator):
+        w = self.writer
+        name = self.const('name', index, validator.param_name)
+        # 获取参数
+        if validator.many:
+            w.line('if is_get:')
+            w.indent()
+            if validator.separator:
+                # 重复的 key 和逗号分隔的值一次处理, 同时去掉空值
+                w.line('value = _split_values(request_data.getlist(%s, []), %s, %s)'
+                       % (name, self.const('separator', index, validator.separator),
+                          self.const('max_items', index, validator.max_items)))
+                self.write_max_items(index, validator, name, 'value')
+            elif validator.max_items is not None:
+                w.line('value = request_data.getlist(%s, [])' % name)
+                self.write_max_items(index, validator, name, 'value')
+                w.line('value = [i for i in value if i not in _NULL]')
+            else:
+                w.line('value = [i for i in request_data.getlist(%s, []) if i not in _NULL]' % name)
+            w.dedent()
+            w.line('else:')
+            w.indent()
+            w.line('value = request_data.get(%s, None)' % name)
+            self.write_max_items(index, validator, name, 'value')
+            w.dedent()
+        else:
+            w.line('value = request_data.get(%s, None)' % name)
+            self.write_max_length(index, validator, name, 'value')
+
+        # 空值: 默认值 / 可选 / 缺少参数
+        w.line('if value in _NULL:')
+        w.indent()
+        if validator.default is not None:
+            w.line('value = %s' % self.const('default', index, validator.default))
+        elif validator.optional:
+            w.line('kwargs[%s] = %s' % (name, '[]' if validator.many else 'None'))
+        else:
+            self.write_raise(name, 'MISSING_MSG', MISSING, 'None', 'None', ['label'])
+        if validator.default is None and validator.optional:
+            w.dedent()
+            w.line('else:')
+            w.indent()
+            self.write_checks(index, validator, name)
+            w.line('kwargs[%s] = value' % name)
+            w.dedent()
+        else:
+            w.dedent()
+            self.write_checks(index, validator, name)
+            w.line('kwargs[%s] = value' % name)
+
+    def write_checks(self, index, validator, name):
+        w = self.writer
+        if validator.param_type:
+            if validator.many:
+                w.line('if not _is_iterable(value):')
+                w.indent()
+                self.write_raise(name, 'ITERABLE_MSG', TYPE, "'iterable'", 'value', ['label', 'type(value).__name__'])
+                w.dedent()
+                if validator.vectorize:
+                    # 由装饰时生成的 numpy 列表校验函数处理
+                    w.line('value = %s.list_checker(value)' % self.const('validator', index, validator))
+                else:
+                    self.write_item_loop(index, validator, name, 'value')
+            else:
+                self.write_type_check(index, validator, name, 'value')
+        self.write_val_check(index, validator, name)
+        if validator.array:
+            w.line('value = %s.to_array(value)' % self.const('validator', index, validator))
+
+    def write_max_items(self, index, validator, name, var):
+        """ 在遍历之前检查元素个数 """
+        if validator.max_items is None:
+            return
+        w = self.writer
+        max_items = self.const('max_items', index, validator.max_items)
+        w.line('if isinstance(%s, _Sized) and len(%s) > %s:' % (var, var, max_items))
+        w.indent()
+        self.write_raise(name, 'MAX_ITEMS_MSG', LIMIT, "('max_items', %s)" % max_items, 'len(%s)' % var,
+                         ['label', max_items])
+        w.dedent()
+
+    def write_max_length(self, index, validator, name, var):
+        """ 在类型转换之前检查字符串的长度 """
+        if validator.max_length is None:
+            return
+        w = self.writer
+        max_length = self.const('max_length', index, validator.max_length)
+        w.line('if isinstance(%s, str) and len(%s) > %s:' % (var, var, max_length))
+        w.indent()
+        self.write_raise(name, 'MAX_LENGTH_MSG', LIMIT, "('max_length', %s)" % max_length, 'len(%s)' % var,
+                         ['label', max_length])
+        w.dedent()
+
+    def write_item_loop(self, index, validator, name, var):
+        """ 一次遍历完成整个列表的转换和检查, 错误信息带上元素下标 """
+        w = self.writer
+        w.line('items = []')
+        w.line('append = items.append')
+        w.line('for i, item in enumerate(%s):' % var)
+        w.indent()
+        label = "'%%s[%%d]' %% (%s, i)" % name
+        self.write_max_length(index, validator, label, 'item')
+        self.write_type_check(index, validator, label, 'item')
+        self.write_bounds(index, validator, label, 'item', prefix='item_')
+        w.line('append(item)')
+        w.dedent()
+        w.line('%s = items' % var)
+
+    def write_type_check(self, index, validator, name, var):
+        w = self.writer
+        param_type = validator.param_type
+        # 转换布尔值
+        if param_type == bool:
+            w.line('s = str(%s).lower()' % var)
+            w.line('if s in _BOOL_STRS:')
+            w.indent()
+            w.line('%s = s not in _FALSE_STRS' % var)
+            w.dedent()
+        # 转换digit
+        if param_type in (int, float):
+            type_name = self.const('type', index, param_type)
+            w.line('if isinstance(%s, str) and %s not in _NULL:' % (var, var))
+            w.indent()
+            w.line('try:')
+            w.indent()
+            w.line('%s = %s(%s)' % (var, type_name, var))
+            w.dedent()
+            w.line('except (TypeError, ValueError):')
+            w.indent()
+            w.line('pass')
+            w.dedent()
+            w.dedent()
+        # 如果是选项
+        if validator.choices:
+            choices = self.const('choices', index, validator.choices)
+            choice_index = self.const('choice_index', index, build_index(validator.choices))
+            w.line('try:')
+            w.indent()
+            w.line('ok = %s in %s' % (var, choice_index))
+            w.dedent()
+            w.line('except TypeError:')
+            w.indent()
+            w.line('ok = False')
+            w.dedent()
+            if validator.optional:
+                w.line('if not ok and %s not in _NULL:' % var)
+            else:
+                w.line('if not ok:')
+            w.indent()
+            self.write_raise(name, 'CHOICES_MSG', CHOICES, choices, var, ['label', choices, var])
+            w.dedent()
+        # 如果是日期格式字符串
+        if param_type == self.params_cls.DATETIME_STR:
+            if validator.datetime_parser is None:
+                raise CompileError('%s is not prepared' % validator.param_name)
+            w.line('try:')
+            w.indent()
+            w.line('parsed = %s(%s)' % (self.const('parse', index, validator.datetime_parser), var))
+            w.dedent()
+            w.line('except (TypeError, ValueError):')
+            w.indent()
+            fmt = self.const('format', index, validator.format)
+            self.write_raise(name, 'DATETIME_MSG', DATETIME, fmt, var, [var, fmt])
+            w.dedent()
+            if validator.parse == 'date':
+                w.line('%s = parsed.date()' % var)
+            elif validator.parse:
+                w.line('%s = parsed' % var)
+        elif not validator.choices:
+            if not isinstance(param_type, type):
+                raise CompileError('unsupported param type: %r' % (param_type,))
+            type_name = self.const('type', index, param_type)
+            w.line('if not isinstance(%s, %s):' % (var, type_name))
+            w.indent()
+            self.write_raise(name, 'TYPE_MSG', TYPE, type_name, var,
+                             ['label', '%s.__name__' % type_name, 'type(%s).__name__' % var])
+            w.dedent()
+
+    def write_val_check(self, index, validator, name):
+        self.write_bounds(index, validator, name, 'value', many=validator.many)
+
+    def write_bounds(self, index, validator, name, var, prefix='', many=False):
+        w = self.writer
+        bounds = [(op, getattr(validator, prefix + op)) for op in ('lt', 'lte', 'gt', 'gte')
+                  if getattr(validator, prefix + op) is not None]
+        if not bounds:
+            return
+        if many:
+            w.line('n = len(%s)' % var)
+        elif validator.param_type in (int, float, bool) and not validator.choices:
+            # 类型检查已经保证不是 iterable
+            w.line('n = %s' % var)
+        else:
+            w.line('n = len(%s) if _is_iterable(%s) else %s' % (var, var, var))
+        operators = {'lt': '<', 'lte': '<=', 'gt': '>', 'gte': '>='}
+        for op, bound in bounds:
+            bound_name = self.const(prefix + op, index, bound)
+            w.line('if not n %s %s:' % (operators[op], bound_name))
+            w.indent()
+            self.write_raise(name, 'RANGE_MSGS[%r]' % op, RANGE, '(%r, %s)' % (op, bound_name), 'n',
+                             ['label', bound_name])
+            w.dedent()
+
+    def write_raise(self, name, template, code, expected, received, template_args):
+        """ 抛出错误, 错误信息在读取时才格式化; name 是参数名的表达式, template_args 中用 label 引用 """
+        w = self.writer
+        w.line('label = %s' % name)
+        w.line('raise _Error(_%s, %r, label, %s, %s, template_args=(%s,))'
+               % (template, code, expected, received, ', '.join(template_args)))
+
+
+class ListCheckerCompiler(ValidatorCompiler):
+    """
+    为 many=True 的 validator 生成列表校验函数, 只做元素的类型转换和检查:
+
+        def check_list(values):
+            items = []
+            for i, item in enumerate(values):
+                ...
+            return items
+    """
+    func_name = 'check_list'
+
+    def compile(self):
+        validator = self.validators[0]
+        w = self.writer
+        w.line('def %s(values):' % self.func_name)
+        w.indent()
+        self.write_item_loop(0, validator, self.const('name', 0, validator.param_name), 'values')
+        w.line('return values')
+        w.dedent()
+        return self.build('<list %s>' % validator.param_name)
+
+
+def compile_validators(validators, params_cls, error_cls):
+    return ValidatorCompiler(validators, params_cls, error_cls).compile()
+
+
+def compile_list_checker(validator, params_cls, error_cls):
+    return ListCheckerCompiler([validator], params_cls, error_cls).compile()
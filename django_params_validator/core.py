@@ -0,0 +1,855 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Time    : 2018/8/10 下午3:39
+# @Author  : wudizhangzhi
+"""
+参数校验的核心部分: 参数声明, 类型转换, 取值范围和选项检查
+
+不导入 Django / DRF, 可以在 celery worker, 命令行工具等环境中直接使用:
+
+    from django_params_validator.core import Params, ParamsError
+
+    params = Params(page=int, page__default=1)
+    params.validate({'page': '2'})
+
+导入本模块只导入 errors.py: 编译, 日期, 选项, model, 缓存, 统计等模块在装饰时, 声明用到对应的选项时才导入.
+"""
+import sys
+from _thread import RLock, get_ident
+from .errors import (ParamsError, DEFAULT_MSG, MISSING, TYPE, CHOICES, RANGE, DATETIME, LIMIT,
+                     MISSING_MSG, ITERABLE_MSG, TYPE_MSG, CHOICES_MSG, DATETIME_MSG, RANGE_MSGS,
+                     MAX_LENGTH_MSG, MAX_ITEMS_MSG)
+try:
+    # collections.abc 会导入 collections; _collections_abc 在解释器启动时已经导入
+    from _collections_abc import Iterable, Sized
+except ImportError:  # python2
+    from collections import Iterable, Sized
+
+
+class ValidationResult(tuple):
+    """ validate_many 的结果 (data, error) """
+    __slots__ = ()
+
+    def __new__(cls, data, error):
+        return tuple.__new__(cls, (data, error))
+
+    data = property(lambda self: self[0])
+    error = property(lambda self: self[1])
+
+    def __getnewargs__(self):
+        return tuple(self)
+
+    def __repr__(self):
+        return 'ValidationResult(data=%r, error=%r)' % self
+
+
+def feature(name):
+    """ 已经导入的功能模块, 没有导入时为 None: 没有导入 choices.py 就不会有 ChoiceSource """
+    return sys.modules.get(__package__ + '.' + name)
+
+
+def is_choice_source(value):
+    choices = feature('choices')
+    return choices is not None and isinstance(value, choices.ChoiceSource)
+
+
+def intern_key(param_name, error_class, options):
+    """ 声明的 key; 1, True 和 1.0 相等, 所以带上值的类型 """
+    try:
+        key = (param_name, error_class, tuple(sorted((k, _freeze(v)) for k, v in options.items())))
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def _freeze(value):
+    if isinstance(value, (list, tuple)):
+        return type(value), tuple(_freeze(v) for v in value)
+    if isinstance(value, (set, frozenset)):
+        return type(value), frozenset(_freeze(v) for v in value)
+    return type(value), value
+
+
+def convert_bool(x):
+    if str(x).lower() in ['0', 'false']:
+        return False
+    else:
+        return True
+
+
+class ParamValidator(object):
+    """
+    一个参数的声明, 以及装饰时根据声明准备好的状态
+    只能声明 OPTIONS 中的选项, 其它的 param__xx 抛出 TypeError.
+    构造之后不可修改; 同样的声明在进程内只构造一次, 由所有 Params 共享, 见 intern.
+    相等和 hash 都按对象本身: 同样的(可以 hash 的)声明就是同一个对象.
+    """
+    ITERABLE_TYPES = tuple, list, set
+    # 可以用 param__option 声明的选项及默认值
+    OPTIONS = {
+        # 基础信息
+        'param_type': None,
+        'val': None,
+
+        # value validators
+        'gt': None,
+        'gte': None,
+        'lt': None,
+        'lte': None,
+        'eq': None,
+        'choices': None,
+        'format': '%Y-%m-%d %H:%M:%S',
+        # DATETIME_STR: 缓存最近解析过的日期字符串的个数
+        'parse_cache': None,
+        # DATETIME_STR: True 把解析后的 datetime 传给 view, 'date' 传 date
+        'parse': False,
+
+        # 在类型转换之前检查原始值: 字符串的最大长度, many=True 的最大元素个数
+        'max_length': None,
+        'max_items': None,
+
+        # optional
+        'optional': True,
+        'default': None,
+
+        # multiple vals
+        'many': False,
+        # many=True 时对每个元素的取值范围
+        'item_gt': None,
+        'item_gte': None,
+        'item_lt': None,
+        'item_lte': None,
+        # many=True 的 int/float 使用 numpy 批量校验, 见 vectorized.py
+        'vectorize': False,
+        # vectorize=True 时把 numpy.ndarray 传给 view
+        'ndarray': False,
+        # GET 中 many=True 的值的分隔符, None 表示 int/float 用 ',', False 表示不分隔
+        'separator': None,
+        # int/float 的列表以 array.array 传给 view
+        'array': False,
+        # many=True 的参数从请求体流式读取, 见 streaming.py
+        'stream': False,
+
+        # db use: 参数是 model 时, 按 field(默认 pk) 查询出实例, 见 lookups.py
+        'field': None,
+        # 查询 model 时只加载的字段
+        'only': None,
+
+        # 参数的来源: query, body, path, header, cookie, None 表示按请求方法选择, 见 sources.py
+        'source': None,
+
+        # 自定义的校验函数, 可以是 async 的, 见 validators.py
+        'validator': None,
+        # 缓存 validator 对每个值的结果的秒数, None 表示不缓存
+        'cache_ttl': None,
+        'cache_size': None,
+        'cache_negative_ttl': None,
+        # Django cache 的名字, 在多个进程之间共享结果
+        'cache_backend': None,
+        # 共享缓存的 key 前缀, 默认为 validator 的 module.qualname 和参数名; lambda 必须指定
+        'cache_key_prefix': None,
+    }
+    # 装饰时根据声明生成的状态
+    PREPARED = (
+        'param_name',
+        # 校验失败时抛出的异常, 由 Params 设置
+        'error_class',
+        # param_type 是 model 时的 model, param_type 为 None
+        'model',
+        # 根据 format 选出的解析函数, 见 datetimes.py
+        'datetime_parser',
+        # 根据 choices 建立的索引, 见 choices.py
+        'choice_index',
+        # 编译好的列表校验函数
+        'list_checker',
+        # validator 结果的缓存, 见 cache.py
+        'result_cache',
+    )
+    # shared: 是否是 intern 共享的 validator
+    __slots__ = tuple(OPTIONS) + PREPARED + ('shared', '_frozen')
+
+    # 进程内共享的 ParamValidator, {声明的 key: ParamValidator}
+    _interned = {}
+
+    def __init__(self, param_name, error_class=None, **options):
+        for option in options:
+            if option not in self.OPTIONS:
+                raise TypeError('Params got an unexpected option %r' % (param_name + '__' + option))
+        for option, default in self.OPTIONS.items():
+            setattr(self, option, options.get(option, default))
+        for name in self.PREPARED:
+            setattr(self, name, None)
+        self.param_name = param_name
+        self.error_class = error_class
+        from .lookups import is_model
+        if is_model(self.param_type):
+            # 先按没有类型的参数取值, 校验完其它参数后再查询实例
+            self.model, self.param_type = self.param_type, None
+        self.prepare()
+        self.shared = False
+        self._frozen = True
+
+    def __setattr__(self, name, value):
+        if getattr(self, '_frozen', False):
+            raise AttributeError('ParamValidator is immutable, declare %s in Params' % name)
+        object.__setattr__(self, name, value)
+
+    @classmethod
+    def intern(cls, param_name, error_class=None, **options):
+        """ 返回共享的 ParamValidator, 声明中有不能 hash 的值时构造新的 """
+        key = intern_key(param_name, error_class, options)
+        if key is None:
+            return cls(param_name, error_class, **options)
+        validator = cls._interned.get(key)
+        if validator is None:
+            validator = cls(param_name, error_class, **options)
+            object.__setattr__(validator, 'shared', True)
+            validator = cls._interned.setdefault(key, validator)
+        return validator
+
+    def __repr__(self):
+        param_type = self.model or self.param_type
+        return '<%s: %s>' % (self.param_name, getattr(param_type, '__name__', param_type))
+
+    # array=True 时的 array.array 类型
+    ARRAY_TYPECODES = {int: 'q', float: 'd'}
+
+    def check(self, param):
+        param = self.check_type(param)
+        param = self.check_val(param)
+        if self.array:
+            param = self.to_array(param)
+        return param
+
+    def to_array(self, values):
+        from array import array
+        try:
+            return array(self.ARRAY_TYPECODES[self.param_type], values)
+        except OverflowError:
+            raise self.error_class(TYPE_MSG, TYPE, self.param_name, 'int64', values,
+                                   template_args=(self.param_name, 'int64', 'int'))
+
+    def prepare(self):
+        """ 所有属性设置完之后, 在装饰时调用一次 """
+        if self.separator is None and self.param_type in (int, float):
+            self.separator = ','
+        if self.source is not None:
+            from .sources import SOURCES
+            if self.source not in SOURCES:
+                    raise TypeError('%s: source should be one of %r, got %r' % (self.param_name, SOURCES, self.source))
+        if self.array and (not self.many or self.param_type not in self.ARRAY_TYPECODES):
+            raise TypeError('%s: array=True needs an int or float many=True param' % self.param_name)
+        if self.choices:
+            from .choices import build_index
+            self.choice_index = build_index(self.choices)
+        if self.validator is not None and self.cache_ttl:
+            from .cache import result_cache
+            self.result_cache = result_cache(self)
+        if self.param_type == Params.DATETIME_STR:
+            from .datetimes import get_parser
+            self.datetime_parser = get_parser(self.format, self.parse_cache)
+        if self.many and self.param_type:
+            from .compiler import compile_list_checker, CompileError
+            try:
+                self.list_checker = compile_list_checker(self, Params, self.error_class)
+            except CompileError:
+                pass
+            if self.vectorize and self.list_checker is not None:
+                from .vectorized import vectorized_list_checker
+                self.list_checker = vectorized_list_checker(
+                    self, self.list_checker, self.error_class) or self.list_checker
+
+    def validate_datetime(self, time_str):
+        parser = self.datetime_parser
+        if parser is None:
+            from .datetimes import get_parser
+            parser = get_parser(self.format)
+        try:
+            parsed = parser(time_str)
+        except (TypeError, ValueError):
+            raise self.error_class(DATETIME_MSG, DATETIME, self.param_name, self.format, time_str,
+                                   template_args=(time_str, self.format))
+        if self.parse == 'date':
+            return parsed.date()
+        if self.parse:
+            return parsed
+        return time_str
+
+    def label(self, index=None):
+        if index is None:
+            return self.param_name
+        return '%s[%d]' % (self.param_name, index)
+
+    def check_type(self, param):
+        # 判断不能为空
+        if self.param_type:
+            if self.many:
+                if not Params.is_iterable(param):
+                    raise self.error_class(ITERABLE_MSG, TYPE, self.param_name, 'iterable', param,
+                                           template_args=(self.param_name, type(param).__name__))
+                self.check_max_items(param)
+                if self.list_checker is not None:
+                    param = self.list_checker(param)
+                else:
+                    param = [self.check_item_val(self.check_item(p, i), i) for i, p in enumerate(param)]
+            else:
+                param = self.check_item(param)
+        return param
+
+    def check_max_items(self, param):
+        # 字符串, dict 等所有有长度的值都在遍历之前检查
+        if self.max_items is not None and isinstance(param, Sized) and len(param) > self.max_items:
+            raise self.max_items_error(len(param))
+
+    def max_items_error(self, count):
+        return self.error_class(MAX_ITEMS_MSG, LIMIT, self.param_name, ('max_items', self.max_items), count,
+                                template_args=(self.param_name, self.max_items))
+
+    def check_item(self, param, index=None):
+        # 在转换之前检查长度, 例如 int() 转换很长的字符串很慢
+        if self.max_length is not None and isinstance(param, str) and len(param) > self.max_length:
+            label = self.label(index)
+            raise self.error_class(MAX_LENGTH_MSG, LIMIT, label, ('max_length', self.max_length), len(param),
+                                   template_args=(label, self.max_length))
+        # 转换布尔值
+        if self.param_type == bool and str(param).lower() in ['0', '1', 'true', 'false']:
+            param = convert_bool(param)
+        # 转换digit
+        if self.param_type in [int, float] and isinstance(param, str) and param not in Params.NULL_VALUE_LIST:
+            try:
+                param = self.param_type(param)
+            except:
+                pass
+
+        # 如果是选项
+        if self.choices:
+            # 同 choices.contains, 在这里展开以免每次校验都导入
+            try:
+                found = param in (self.choice_index if self.choice_index is not None else self.choices)
+            except TypeError:  # 不能 hash 的值不可能在 frozenset 中
+                found = False
+            if not found:
+                if param in Params.NULL_VALUE_LIST and self.optional:
+                    pass
+                else:
+                    label = self.label(index)
+                    raise self.error_class(CHOICES_MSG, CHOICES, label, self.choices, param,
+                                           template_args=(label, self.choices, param))
+        # 如果是日期格式字符串
+        if self.param_type == Params.DATETIME_STR:
+            param = self.validate_datetime(param)
+        elif self.param_type and not self.choices and not isinstance(param, self.param_type):
+            label = self.label(index)
+            raise self.error_class(TYPE_MSG, TYPE, label, self.param_type, param,
+                                   template_args=(label, self.param_type.__name__, type(param).__name__))
+        return param
+
+    def check_item_val(self, param, index):
+        if not any(bound is not None for bound in (self.item_lt, self.item_lte, self.item_gt, self.item_gte)):
+            return param
+        if Params.is_iterable(param):
+            val_or_length = len(param)
+        else:
+            val_or_length = param
+        self.check_bounds(val_or_length, self.label(index), self.item_lt, self.item_lte, self.item_gt, self.item_gte)
+        return param
+
+    def check_val(self, param):
+        if Params.is_iterable(param):
+            val_or_length = len(param)
+        else:
+            val_or_length = param
+        # 判断取值范围
+        self.check_bounds(val_or_length, self.param_name, self.lt, self.lte, self.gt, self.gte)
+        return param
+
+    def check_bounds(self, value, label, lt, lte, gt, gte):
+        if lt is not None and not value < lt:
+            raise self.range_error('lt', lt, value, label)
+        if lte is not None and not value <= lte:
+            raise self.range_error('lte', lte, value, label)
+        if gt is not None and not value > gt:
+            raise self.range_error('gt', gt, value, label)
+        if gte is not None and not value >= gte:
+            raise self.range_error('gte', gte, value, label)
+
+    def range_error(self, op, bound, value, label):
+        return self.error_class(RANGE_MSGS[op], RANGE, label, (op, bound), value, template_args=(label, bound))
+
+
+class Params(object):
+    """
+    参数声明
+    Params(param=float, param__gte=120, param__lte=200,
+           is_true=boolean, is_true__default=True,
+           colors=('red','blue','green','yellow'), colors__many=True)
+    自动判断参数类型 int, float, str, datetime
+    自动判断参数范围 大于小于等于，选项 
+    如果参数类型是bool, 自动将['1', 1]转化为 True, ['0', 0]转化为False
+    param__many=True, 是list
+    
+    optional=False:
+        raise 
+    optional=True:
+        many=True:
+            return []
+        many=False
+            return None
+
+    以 _ 开头的参数是 Params 本身的选项:
+        _compile=True: 把参数声明编译成专用的校验函数, 编译失败时退回逐个 validator 解释执行
+        _name: 名字, 用于统计
+        _instrument: 统计每个参数的耗时和失败, 见 instrumentation.py
+        _collect_errors: 校验所有参数, 一次报告所有错误
+        _identity_cache: 同一个请求里多次校验共享查询到的 model 实例, 见 lookups.py
+        _memoize: 缓存 GET 请求的校验结果, True 或者缓存的个数, 见 cache.py
+        _order: 参数的校验顺序, 'cost', 'declared' 或 'adaptive', 见 ordering.py
+        _defer: 第一次校验时才生成 validator 并编译, 减少导入 view 的时间
+
+    校验普通的 dict, 失败抛出 ParamsError:
+        Params(...).validate(data)
+        Params(...).validate_many(records, max_workers=4)
+
+    这里不依赖 Django 和 DRF; 作为 DRF view 的装饰器使用的是 django_params_validator.Params
+    """
+    split_str = '__'
+    choices_str = 'choices'
+    param_type_str = 'param_type'
+    # 日期时间类型
+    DATETIME_STR = 'datetime_str'
+    # DATETIME_STR 的 ISO-8601 格式: format=Params.ISO_FORMAT
+    ISO_FORMAT = 'iso'  # datetimes.ISO_FORMAT
+
+    NULL_VALUE_LIST = [None, '', []]
+
+    # 所有参数默认的 max_length / max_items, None 表示不限制
+    DEFAULT_MAX_LENGTH = None
+    DEFAULT_MAX_ITEMS = None
+    # 默认是否延迟构造
+    DEFER = False
+
+    # 校验失败时抛出的异常
+    error_class = ParamsError
+
+    # 进程内共享的编译结果, {(Params 类, 错误类, validator 的 id): (validators, 函数)}
+    # 只缓存 intern 共享的 validator; 它们一直被 ParamValidator._interned 引用, id 不会被复用
+    _compiled_cache = {}
+
+    # 装饰器选项及默认值
+    option_prefix = '_'
+    OPTIONS = {
+        'compile': True,
+        # 名字, 用于统计; 装饰器默认为 view 的 module.qualname
+        'name': None,
+        # 是否统计校验耗时和失败, None 表示设置了 instrumentation 的 sink 时打开
+        'instrument': None,
+        # 校验所有参数, 把所有错误合并成一个 ParamsError(code='multiple', errors=[...]) 抛出
+        'collect_errors': False,
+        # DRF 的 request 上保存查询到的 model 实例, 同一个请求里的其它 Params 不再查询
+        'identity_cache': False,
+        # 按原始值缓存 GET 请求的校验结果(LRU), True 表示 DEFAULT_MEMO_SIZE 个
+        'memoize': None,
+        # 参数的校验顺序, 见 ORDERS
+        'order': 'cost',
+        # 构造时只保存声明, 第一次校验(或调用 build)时才生成 validator 并编译, 见 warmup.py
+        # None 表示使用 default_defer()
+        'defer': None,
+    }
+    _build_lock = RLock()
+    # {Params 类: 延迟构造时使用的子类}
+    _deferred_classes = {}
+
+    def __init__(self, **params):
+        self._options = dict(self.OPTIONS)
+        for k in [k for k in params if k.startswith(self.option_prefix)]:
+            option = k[len(self.option_prefix):]
+            if option not in self.OPTIONS:
+                raise TypeError('Params got an unexpected option %r' % k)
+            self._options[option] = params.pop(k)
+        self._params = params
+        self.name = self._options['name']
+        defer = self._options['defer']
+        if defer is None:
+            defer = self.default_defer()
+        if defer:
+            # 构造之前使用 DeferredParams 的子类, 第一次校验时构造, 见 build
+            self.__class__ = self.deferred_class()
+        else:
+            self.build()
+
+    @classmethod
+    def deferred_class(cls):
+        deferred = cls._deferred_classes.get(cls)
+        if deferred is None:
+            deferred = cls._deferred_classes.setdefault(
+                cls, type(cls.__name__, (DeferredParams, cls), {'built_class': cls}))
+        return deferred
+
+    def build(self):
+        """ 根据声明生成 validator 并编译; 延迟构造时多次调用只构造一次 """
+        with self._build_lock:
+            deferred = type(self)
+            if not issubclass(deferred, DeferredParams):
+                if '_validators' in self.__dict__:
+                    return
+                self._build()
+                return
+            # 构造完成之前其它线程访问构造结果时在 _build_lock 上等待, 最后才换回原来的类
+            # 构造中访问还没有生成的属性时不再递归构造
+            self._building = get_ident()
+            try:
+                self._build()
+            finally:
+                del self._building
+            self.__class__ = deferred.built_class
+
+    def _build(self):
+        # 生成验证器: {参数名: {选项: 值}}
+        declared = {}
+        for k, v in self._params.items():
+            if self.split_str in k:
+                p_name, arg = k.split(self.split_str, 1)
+            else:
+                p_name = k
+                arg = self.param_type_str
+                if self.is_iterable(v) or is_choice_source(v):  # determine whether param is iterable
+                    arg = self.choices_str
+            declared.setdefault(p_name, {})[arg] = v
+        for options in declared.values():
+            # 选项: 声明了类型时按声明的类型, 否则按选项的类型
+            choices = options.get(self.choices_str)
+            param_type = options.get(self.param_type_str)
+            if callable(choices) and not is_choice_source(choices):
+                from .choices import ChoiceSource
+                choices = options[self.choices_str] = ChoiceSource(choices, param_type=param_type or str)
+            if param_type is None:
+                if is_choice_source(choices):
+                    options[self.param_type_str] = choices.param_type
+                elif choices:
+                    options[self.param_type_str] = type(next(iter(choices)))
+        max_length, max_items = self.default_limits()
+        self._validators = {}
+        for p_name, options in declared.items():
+            if options.get('max_length') is None and max_length is not None:
+                options['max_length'] = max_length
+            if options.get('max_items') is None and max_items is not None and options.get('many'):
+                options['max_items'] = max_items
+            self._validators[p_name] = ParamValidator.intern(p_name, self.error_class, **options)
+        self._models = [v for v in self._validators.values() if v.model is not None]
+        streams = [v for v in self._validators.values() if v.stream]
+        if len(streams) > 1 or (streams and not streams[0].many):
+            raise TypeError('Params can stream only one many=True param')
+        # 流式读取的参数不参与编译和 validate, 由 validate_stream 处理
+        self._stream = streams[0] if streams else None
+        if self._stream is not None:
+            del self._validators[self._stream.param_name]
+        self._custom = [v for v in self._validators.values() if v.validator is not None]
+        # 有参数声明了 source 时, 按来源获取参数
+        self._sources = None
+        if any(v.source is not None for v in self._validators.values()):
+            from .sources import SourcePlan
+            self._sources = SourcePlan(self._validators.values())
+        order = self._options['order']
+        from .ordering import ORDERS, AdaptiveOrder, cost_order
+        if order not in ORDERS:
+            raise ValueError('_order should be one of %r, got %r' % (ORDERS, order))
+        # _collect_errors 按声明的顺序报告错误
+        self._declared = list(self._validators.values())
+        if order != 'declared':
+            self._validators = dict((v.param_name, v) for v in cost_order(self._declared, Params))
+        self._compiled = None
+        if self._options['compile']:
+            from .compiler import CompileError
+            try:
+                self._compiled = self.compile(self._validators.values())
+            except CompileError:
+                pass
+        # 替换的 validate 最后一次设置, 延迟构造时其它线程不会用到构造了一半的 validate
+        validate = None
+        self.adaptive = None
+        instrument = self._options['instrument']
+        # 只有打开统计的实例才替换 validate, 其它实例没有额外开销
+        instrument = instrument or (instrument is None and feature('instrumentation') is not None and
+                                    feature('instrumentation').is_enabled())
+        if instrument:
+            from . import instrumentation
+        if self._options['collect_errors']:
+            self._checks = self.param_checks(self._declared)
+            if instrument:
+                self._checks = instrumentation.instrumented_checks(self, self._checks)
+            validate = self.validate_collect
+        elif order == 'adaptive':
+            checks = self.param_checks()
+            if instrument:
+                checks = instrumentation.instrumented_checks(self, checks)
+            self.adaptive = AdaptiveOrder(self, checks=checks)
+            validate = self.adaptive.validate
+        if instrument:
+            validate = instrumentation.instrumented_validate(self, validate)
+        self.memo = None
+        memoize = self._options['memoize']
+        if memoize:
+            from .cache import LRUCache, memoizable, memoized_validate, DEFAULT_MEMO_SIZE
+        if memoize and memoizable(self):
+            self.memo = LRUCache(DEFAULT_MEMO_SIZE if memoize is True else memoize)
+            if validate is None:
+                # 延迟构造时 type(self) 还是 DeferredParams 的子类
+                validate = getattr(type(self), 'built_class', type(self)).validate.__get__(self)
+            validate = memoized_validate(self, validate, self.memo)
+        if validate is not None:
+            self.validate = validate
+
+    def compile(self, validators):
+        """ 编译一组 validator; ParamValidator 是共享的, 同样的组合在进程内只编译一次 """
+        from .compiler import compile_validators
+        validators = tuple(validators)
+        if not all(v.shared for v in validators):
+            # 声明中有不能 hash 的值时每个 Params 的 validator 都是新的, 缓存只会增长, 不缓存
+            return compile_validators(validators, self, self.error_class)
+        key = (type(self), self.error_class, tuple(id(v) for v in validators))
+        cached = self._compiled_cache.get(key)
+        if cached is None:
+            # 保存 validators, 保证 id 不会被其它对象复用
+            cached = self._compiled_cache.setdefault(
+                key, (validators, compile_validators(validators, self, self.error_class)))
+        return cached[1]
+
+    def default_defer(self):
+        """ 没有声明 _defer 时是否延迟构造 """
+        return self.DEFER
+
+    def default_limits(self):
+        """ 没有声明 max_length / max_items 的参数使用的默认值 """
+        return self.DEFAULT_MAX_LENGTH, self.DEFAULT_MAX_ITEMS
+
+    def memo_info(self):
+        """ _memoize 的命中统计, 没有缓存时返回 None """
+        return self.memo.info() if self.memo is not None else None
+
+    @staticmethod
+    def is_iterable(v):
+        # 不直接比较 v != DATETIME_STR, numpy.ndarray 的比较结果是数组
+        if isinstance(v, Iterable) and not (isinstance(v, str) and v == Params.DATETIME_STR):
+            return True
+        else:
+            return False
+
+    @staticmethod
+    def split_values(values, separator, max_items=None):
+        """
+        GET 中重复的 key 和用 separator 分隔的值: ['1,2', '3', ''] -> ['1', '2', '3'], 去掉空值
+        指定 max_items 时最多分隔出 max_items + 1 个值, 超过的部分不分隔, 由 check_max_items 报告
+        """
+        try:
+            joined = separator.join(values)
+            if max_items is not None and joined.count(separator) >= max_items:
+                parts = joined.split(separator, max_items)
+                rest = parts[-1]
+                # 前 max_items 个值都不是空值, 剩余部分不只是分隔符: 一定超过 max_items
+                if all(parts[:-1]) and len(rest) > rest.count(separator) * len(separator):
+                    return parts
+            return [i for i in joined.split(separator) if i]
+        except TypeError:  # 有不是字符串的值
+            result = []
+            for value in values:
+                if isinstance(value, str):
+                    result.extend(i for i in value.split(separator) if i)
+                elif value not in Params.NULL_VALUE_LIST:
+                    result.append(value)
+            return result
+
+    def _pool_params(self):
+        """
+        进程池的子进程里用纯 python 的 Params 重建声明, 子进程不需要导入 Django
+        default_limits 的结果(例如 settings 中的默认值)也写进声明, 子进程里的 Params 读不到 settings
+        """
+        spec = self._spec(Params.OPTIONS)
+        validators = list(self._declared)
+        if self._stream is not None:
+            validators.append(self._stream)
+        for validator in validators:
+            for option in ('max_length', 'max_items'):
+                value = getattr(validator, option)
+                if value is not None:
+                    spec[validator.param_name + self.split_str + option] = value
+        return Params, spec
+
+    def _spec(self, options=None):
+        """ 重新构造同样 Params 所需的参数, options 限定只保留哪些选项 """
+        spec = dict(self._params)
+        for option, value in self._options.items():
+            if options is None or option in options:
+                spec[self.option_prefix + option] = value
+        return spec
+
+    def validate(self, request_data, is_get=False, kwargs=None, identity_cache=None):
+        """
+        校验一组参数, 返回转换后的参数, 失败抛出 error_class
+        request_data: request.GET / request.data, 或者普通的 dict
+        is_get: many=True 的参数是否用 getlist 获取
+        identity_cache: model 参数查询到的实例, 可以在多次校验之间共享
+        """
+        if kwargs is None:
+            kwargs = {}
+        if self._compiled is not None:
+            self._compiled(request_data, is_get, kwargs)
+        else:
+            self.interpret(request_data, is_get, kwargs)
+        if self._models or self._custom:
+            errors = self.finish(kwargs, identity_cache)
+            if errors:
+                raise self.error_class.collect(errors)
+        return kwargs
+
+    def finish(self, kwargs, identity_cache=None):
+        """ 所有参数检查之后, 查询 model 实例, 运行自定义的 validator; 返回错误列表 """
+        from . import validators as custom_validators
+        errors = []
+        if custom_validators.deferred.get():
+            # async view 的 wrapper 在事件循环之外查询 model, 然后 await 自定义的 validator
+            return errors
+        if self._models:
+            errors.extend(self.resolve_models(kwargs, identity_cache))
+        if self._custom and not errors:
+            errors.extend(custom_validators.run_validators(self._custom, kwargs, self.error_class))
+        return errors
+
+    def resolve_models(self, kwargs, identity_cache=None):
+        """ 把 model 参数换成实例, 返回错误列表 """
+        from .lookups import resolve_instances
+        return resolve_instances(self._models, kwargs, self.error_class, identity_cache)
+
+    async def arun_validators(self, kwargs):
+        """ async view 中并发运行自定义的 validator, 失败抛出 error_class """
+        from . import validators as custom_validators
+        errors = await custom_validators.arun_validators(self._custom, kwargs, self.error_class)
+        if errors:
+            raise self.error_class.collect(errors)
+        return kwargs
+
+    def validate_stream(self, fp, kwargs):
+        """ 把 stream=True 的参数换成从 fp 读取 JSON 数组, 逐个校验元素的 generator """
+        from .streaming import open_stream
+        kwargs[self._stream.param_name] = open_stream(self._stream, fp, self.error_class)
+        return kwargs
+
+    def param_checks(self, validators=None):
+        """ 每个参数单独的校验函数 [(validator, check)], check(request_data, is_get, kwargs) """
+        from functools import partial
+        from .compiler import CompileError
+        checks = []
+        for validator in (self._validators.values() if validators is None else validators):
+            check = None
+            if self._options['compile']:
+                try:
+                    check = self.compile([validator])
+                except CompileError:
+                    pass
+            if check is None:
+                check = partial(self.interpret_one, validator)
+            checks.append((validator, check))
+        return checks
+
+    def validate_collect(self, request_data, is_get=False, kwargs=None, identity_cache=None):
+        """ collect_errors 模式: 校验所有参数后再抛出错误 """
+        if kwargs is None:
+            kwargs = {}
+        errors = []
+        for validator, check in self._checks:
+            try:
+                check(request_data, is_get, kwargs)
+            except self.error_class as e:
+                errors.append(e)
+        if self._models or self._custom:
+            errors.extend(self.finish(kwargs, identity_cache))
+        if errors:
+            raise self.error_class.collect(errors)
+        return kwargs
+
+    def interpret(self, request_data, is_get, kwargs):
+        for validator in self._validators.values():
+            self.interpret_one(validator, request_data, is_get, kwargs)
+        return kwargs
+
+    def interpret_one(self, validator, request_data, is_get, kwargs):
+        param_name = validator.param_name
+        null_list = []
+        if validator.many and is_get:
+            param = request_data.getlist(param_name, null_list)
+            if validator.separator:
+                param = self.split_values(param, validator.separator, validator.max_items)
+                validator.check_max_items(param)
+            else:
+                validator.check_max_items(param)
+                # 过滤
+                param = [i for i in param if i not in self.NULL_VALUE_LIST]
+        else:
+            param = request_data.get(param_name, None)
+
+        need_check = True
+        if param in self.NULL_VALUE_LIST:
+            if validator.default is not None:
+                param = validator.default
+            elif validator.optional:
+                if validator.many:
+                    param = []
+                else:
+                    param = None
+                need_check = False
+            else:
+                raise self.error_class(MISSING_MSG, MISSING, param_name, template_args=(param_name,))
+
+        # if param not in self.NULL_VALUE_LIST:
+        #     kwargs[param_name] = param
+        # if param in self.NULL_VALUE_LIST:  # 如果参数值是空
+        #     if validator.default is not None:  # 如果有默认值
+        #         kwargs[param_name] = validator.default
+        #         continue
+        #     if validator.optional:  # 如果不必填
+        #         continue
+        #     else:
+        #         raise ParamsErrorException('缺少参数 %s' % param_name)
+        if need_check:
+            param = validator.check(param)
+        # 没有办法修改querydict。先保存到kwargs
+        kwargs[param_name] = param
+        return kwargs
+
+    def validate_many(self, records, chunk_size=None, max_workers=None, executor=None):
+        """
+        批量校验多条记录(普通 dict), 不会因为某一条出错而中断
+        返回与 records 一一对应的 ValidationResult(data, error), 出错时 data 为 None, error 为错误信息
+        指定 max_workers 或 executor 时把 records 按 chunk_size 分块, 交给进程池并行校验
+        """
+        if max_workers or executor is not None:
+            from .bulk import validate_in_pool
+            return validate_in_pool(self, records, chunk_size, max_workers, executor)
+        results = []
+        for record in records:
+            try:
+                results.append(ValidationResult(self.validate(record), None))
+            except ParamsError as e:
+                results.append(ValidationResult(None, e.message))
+        return results
+
+
+class DeferredParams(object):
+    """
+    _defer=True 的 Params 在构造之前的类
+    只在构造之前定义 __getattr__: 定义了 __getattr__ 的类的属性访问都会变慢, 构造后换回 built_class
+    """
+    # build 生成的属性, 访问这些属性时先构造
+    BUILT_ATTRS = frozenset(['_validators', '_declared', '_models', '_stream', '_custom', '_sources', '_compiled',
+                             '_checks', 'adaptive', 'memo'])
+
+    def validate(self, request_data, is_get=False, kwargs=None, identity_cache=None):
+        self.build()
+        return self.validate(request_data, is_get, kwargs, identity_cache)
+
+    def __getattr__(self, name):
+        if name in self.BUILT_ATTRS and '_options' in self.__dict__ and \
+                self.__dict__.get('_building') != get_ident():
+            self.build()
+            return getattr(self, name)
+        raise AttributeError('%r object has no attribute %r' % (type(self).__name__, name))
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author  : wudizhangzhi
+"""
+DATETIME_STR 的日期解析
+
+datetime.strptime 每次调用都要加锁并重新解析 format, 这里在装饰时根据 format 选出专用的解析函数:
+    '%Y-%m-%d'            按位置切片
+    '%Y-%m-%d %H:%M:%S'   按位置切片
+    ISO_FORMAT            datetime.fromisoformat
+    其它                  datetime.strptime
+切片解析不匹配时(例如 '2018-1-5')交给 strptime, 保证接受的输入和 strptime 一致.
+"""
+import datetime
+from functools import lru_cache
+
+# format='iso' 表示 ISO-8601, 使用 datetime.fromisoformat 解析
+ISO_FORMAT = 'iso'
+
+
+def strptime_parser(fmt):
+    strptime = datetime.datetime.strptime
+
+    def parse(time_str):
+        return strptime(time_str, fmt)
+
+    return parse
+
+
+def date_parser(fmt):
+    fallback = strptime_parser(fmt)
+
+    def parse(s):
+        if (isinstance(s, str) and len(s) == 10 and s[4] == '-' and s[7] == '-'
+                and s[:4].isdigit() and s[5:7].isdigit() and s[8:].isdigit()):
+            try:
+                return datetime.datetime(int(s[:4]), int(s[5:7]), int(s[8:]))
+            except ValueError:
+                pass
+        return fallback(s)
+
+    return parse
+
+
+def datetime_parser(fmt):
+    fallback = strptime_parser(fmt)
+
+    def parse(s):
+        if (isinstance(s, str) and len(s) == 19 and s[4] == '-' and s[7] == '-' and s[10] == ' '
+                and s[13] == ':' and s[16] == ':'
+                and (s[:4] + s[5:7] + s[8:10] + s[11:13] + s[14:16] + s[17:]).isdigit()):
+            try:
+                return datetime.datetime(int(s[:4]), int(s[5:7]), int(s[8:10]),
+                                         int(s[11:13]), int(s[14:16]), int(s[17:]))
+            except ValueError:
+                pass
+        return fallback(s)
+
+    return parse
+
+
+def iso_parser(fmt):
+    fromisoformat = datetime.datetime.fromisoformat
+
+    def parse(time_str):
+        if not isinstance(time_str, str):
+            raise TypeError('fromisoformat: argument must be str')
+        return fromisoformat(time_str)
+
+    return parse
+
+
+PARSERS = {
+    '%Y-%m-%d': date_parser,
+    '%Y-%m-%d %H:%M:%S': datetime_parser,
+    ISO_FORMAT: iso_parser,
+}
+
+
+def get_parser(fmt, cache_size=None):
+    """
+    根据 format 返回解析函数 str -> datetime.datetime, 解析失败抛出 ValueError/TypeError
+    cache_size: 缓存最近解析过的字符串, 解析失败的不会被缓存
+    """
+    parse = PARSERS.get(fmt, strptime_parser)(fmt)
+    if cache_size:
+        parse = lru_cache(maxsize=cache_size)(parse)
+    return parse
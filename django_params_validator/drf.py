@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author  : wudizhangzhi
+"""
+Django REST Framework 的适配层: 异常和 view 装饰器
+"""
+from functools import wraps
+from inspect import iscoroutinefunction
+from rest_framework.exceptions import APIException
+from rest_framework import status
+from django.conf import settings
+from . import core
+from .core import ParamsError, DEFAULT_MSG
+from .cache import canonical_key
+from .validators import deferred
+from .sources import QUERY, BODY, request_method, request_body, request_stream
+
+# _identity_cache=True 时保存 model 实例的 request 属性
+IDENTITY_CACHE_ATTR = '_params_identity_cache'
+# _canonical_key=True 时保存校验后参数的 hash 的 request 属性
+PARAMS_KEY_ATTR = 'params_key'
+
+
+class ParamsErrorException(ParamsError, APIException):
+    status_code = status.HTTP_200_OK
+    # status_code = status.HTTP_400_BAD_REQUEST
+    default_detail = DEFAULT_MSG
+
+    def __init__(self, detail=None, code=None, param=None, expected=None, received=None,
+                 template_args=None, errors=None):
+        ParamsError.__init__(self, detail, code, param, expected, received, template_args, errors)
+        # 如果不是测试模式，只显示默认信息; 错误信息只在 DEBUG 模式下格式化
+        if not settings.DEBUG:
+            detail = getattr(settings, 'API_DEFAULT_MSG', self.default_detail)
+        elif self.errors:
+            detail = self.as_dict()
+        else:
+            detail = self.message
+        APIException.__init__(self, detail, code)
+
+    __str__ = APIException.__str__
+
+
+class Params(core.Params):
+    """
+    参数检查装饰器
+    @Params(param=float, param__gte=120, param__lte=200,
+            is_true=boolean, is_true__default=True,
+            colors=('red','blue','green','yellow'), colors__many=True)
+    参数声明见 core.Params, 校验失败抛出 ParamsErrorException
+
+    DRF 的选项:
+        _canonical_key: 把校验后的 kwargs 的稳定 hash 保存为 request.params_key
+        _cache_response: GET 请求的 response 按 request.params_key 缓存的秒数, 并支持 If-None-Match
+        _cache_alias: 使用的 Django cache
+    """
+    error_class = ParamsErrorException
+
+    OPTIONS = dict(core.Params.OPTIONS, **{
+        'canonical_key': False,
+        # None 表示不缓存 response
+        'cache_response': None,
+        'cache_alias': 'default',
+    })
+
+    def default_defer(self):
+        """ settings.PARAMS_VALIDATOR_DEFER """
+        return getattr(settings, 'PARAMS_VALIDATOR_DEFER', self.DEFER)
+
+    def default_limits(self):
+        """ settings.PARAMS_VALIDATOR_MAX_LENGTH / PARAMS_VALIDATOR_MAX_ITEMS """
+        return (getattr(settings, 'PARAMS_VALIDATOR_MAX_LENGTH', self.DEFAULT_MAX_LENGTH),
+                getattr(settings, 'PARAMS_VALIDATOR_MAX_ITEMS', self.DEFAULT_MAX_ITEMS))
+
+    def validate_request(self, first_arg, args, kwargs):
+        """ 从 view 的参数中取出 request, 校验后把参数写入 kwargs """
+        # 获取参数
+        if len(args) == 0:
+            request = first_arg  # request function is a top-level function
+        else:
+            request = args[0]  # request fn is a method, first_arg is 'self'
+
+        self.check_request(request, kwargs)
+        return request
+
+    def check_request(self, request, kwargs):
+        """ 校验 DRF 的 request(或者 async view 的 HttpRequest), 把参数写入 kwargs """
+        method = request_method(request)
+
+        is_get = method == 'GET'
+        if self._sources is not None:
+            # 只读取用到的来源, 没有参数在 body 中时不会读取 request.data
+            default = QUERY if is_get or self._stream is not None else BODY
+            request_data, is_get = self._sources.data(request, kwargs, default), True
+        elif is_get:
+            request_data = request.GET
+        elif self._stream is not None:
+            # 不读取 request.data, 请求体留给 validate_stream, 其它参数从 query string 获取
+            request_data, is_get = request.GET, True
+        else:
+            request_data = request_body(request)
+
+        identity_cache = None
+        if self._options['identity_cache']:
+            identity_cache = getattr(request, IDENTITY_CACHE_ATTR, None)
+            if identity_cache is None:
+                identity_cache = {}
+                setattr(request, IDENTITY_CACHE_ATTR, identity_cache)
+
+        # 没有办法修改querydict。先保存到kwargs
+        self.validate(request_data, is_get, kwargs, identity_cache)
+        if self._stream is not None:
+            self.validate_stream(None if method == 'GET' else request_stream(request), kwargs)
+        if not deferred.get():
+            self.set_params_key(request, kwargs)
+        return kwargs
+
+    def set_params_key(self, request, kwargs):
+        if self._options['canonical_key'] or self._options['cache_response'] is not None:
+            # kwargs 中也有 url 中的参数(例如 pk)
+            setattr(request, PARAMS_KEY_ATTR, canonical_key(kwargs))
+
+    async def afinish(self, request, kwargs):
+        """ async view 中查询 model 实例(同步的 ORM 查询在线程中运行), 然后并发运行自定义的 validator """
+        if self._models:
+            from asgiref.sync import sync_to_async
+            errors = await sync_to_async(self.resolve_models)(kwargs, getattr(request, IDENTITY_CACHE_ATTR, None))
+            if errors:
+                raise self.error_class.collect(errors)
+        if self._custom:
+            await self.arun_validators(kwargs)
+        self.set_params_key(request, kwargs)
+
+    def cached_response(self, request):
+        """ 返回 (cache key, 缓存的 response 或 304), 不缓存时 key 为 None """
+        if request_method(request) not in ('GET', 'HEAD'):
+            return None, None
+        from django.core.cache import caches
+        key = 'params_response:%s:%s' % (self.name, getattr(request, PARAMS_KEY_ATTR))
+        cached = caches[self._options['cache_alias']].get(key)
+        if cached is None:
+            return key, None
+        data, status_code, etag = cached
+        return key, self.etag_response(request, etag, data, status_code)
+
+    def store_response(self, key, request, response):
+        """ 缓存 200 的 response.data, ETag 是 response.data 的 hash """
+        if key is None or getattr(response, 'status_code', None) != status.HTTP_200_OK or \
+                not hasattr(response, 'data'):
+            return response
+        from django.core.cache import caches
+        etag = '"%s"' % canonical_key(response.data)
+        caches[self._options['cache_alias']].set(key, (response.data, response.status_code, etag),
+                                                 self._options['cache_response'])
+        if etag in if_none_match(request):
+            return self.etag_response(request, etag)
+        response['ETag'] = etag
+        return response
+
+    @staticmethod
+    def etag_response(request, etag, data=None, status_code=status.HTTP_200_OK):
+        from rest_framework.response import Response
+        if etag in if_none_match(request) or '*' in if_none_match(request):
+            return Response(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        return Response(data, status=status_code, headers={'ETag': etag})
+
+    def __call__(self, func):
+        if self.name is None:
+            self.name = '%s.%s' % (func.__module__, func.__qualname__)
+        cache_response = self._options['cache_response'] is not None
+        if iscoroutinefunction(func):
+            # async view: 参数检查直接在事件循环里运行, 只有 model 查询经过 sync_to_async
+            @wraps(func)
+            async def async_wrapper(first_arg, *args, **kwargs):
+                if self._models or self._custom:
+                    # model 查询不在事件循环里运行, 自定义的 validator 在事件循环中并发运行, 不阻塞
+                    token = deferred.set(True)
+                    try:
+                        request = self.validate_request(first_arg, args, kwargs)
+                    finally:
+                        deferred.reset(token)
+                    await self.afinish(request, kwargs)
+                else:
+                    request = self.validate_request(first_arg, args, kwargs)
+                if not cache_response:
+                    return await func(first_arg, request, *args, **kwargs)
+                key, response = self.cached_response(request)
+                if response is not None:
+                    return response
+                response = await func(first_arg, request, *args, **kwargs)
+                return self.store_response(key, request, response)
+
+            async_wrapper.params = self
+            return async_wrapper
+
+        @wraps(func)
+        def wrapper(first_arg, *args, **kwargs):
+            request = self.validate_request(first_arg, args, kwargs)
+            if not cache_response:
+                return func(first_arg, request, *args, **kwargs)
+            key, response = self.cached_response(request)
+            if response is not None:
+                return response
+            response = func(first_arg, request, *args, **kwargs)
+            return self.store_response(key, request, response)
+
+        # warmup.py 通过 view.params 找到 Params
+        wrapper.params = self
+        return wrapper
+
+
+def if_none_match(request):
+    """ If-None-Match 中的 ETag, 忽略弱校验的 W/ 前缀 """
+    header = request.META.get('HTTP_IF_NONE_MATCH', '')
+    return [tag.strip()[2:] if tag.strip().startswith('W/') else tag.strip() for tag in header.split(',')]
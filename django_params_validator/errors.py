@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author  : wudizhangzhi
+"""
+参数错误
+
+ParamsError 保存结构化的信息(param, code, expected, received), 错误信息在第一次读取 message 时才格式化:
+非 DEBUG 模式下 DRF 只返回默认信息, 不需要为每个被拒绝的请求格式化错误信息.
+"""
+
+DEFAULT_MSG = '请求参数错误'
+
+# 错误类型, 即 ParamsError.code
+MISSING = 'missing'
+TYPE = 'type'
+CHOICES = 'choices'
+RANGE = 'range'
+DATETIME = 'datetime'
+# model 参数找不到对应的实例
+NOT_FOUND = 'not_found'
+# 自定义的 validator 不通过
+INVALID = 'invalid'
+# 原始值超过 max_length / max_items
+LIMIT = 'limit'
+# collect_errors 模式下多个错误合并后的类型
+MULTIPLE = 'multiple'
+ERROR_CODES = (MISSING, TYPE, CHOICES, RANGE, DATETIME, NOT_FOUND, INVALID, LIMIT, MULTIPLE)
+
+# 错误信息模板
+MISSING_MSG = '缺少参数 %s'
+ITERABLE_MSG = '%s 应该是 iterable, 收到的是 %s'
+TYPE_MSG = '%s 应该是 %s类型, 收到的是 %s'
+CHOICES_MSG = '%s 只能在 %r 内取值, 而接受到的是: %s'
+DATETIME_MSG = '错误的日期格式: %s, 应该是: %s'
+NOT_FOUND_MSG = '%s 不存在: %s'
+STREAM_MSG = '%s 应该是 JSON 数组: %s'
+INVALID_MSG = '%s 不合法: %s'
+MAX_LENGTH_MSG = '%s 的长度不能超过 %s'
+MAX_ITEMS_MSG = '%s 的元素个数不能超过 %s'
+RANGE_MSGS = {
+    'lt': '%s 应该小于 %s',
+    'lte': '%s 应该小于等于 %s',
+    'gt': '%s 应该大于 %s',
+    'gte': '%s 应该大于等于 %s',
+}
+
+
+class ParamsError(Exception):
+    """
+    参数错误
+    message: 错误信息; 指定 template_args 时是模板, 读取 message 时才格式化
+    code: 错误类型(ERROR_CODES)
+    param: 参数名, many=True 的元素为 'ids[3]'
+    expected: 期望的类型/选项/范围/日期格式
+    received: 收到的值
+    errors: collect_errors 模式下收集到的所有错误
+    """
+
+    def __init__(self, message=None, code=None, param=None, expected=None, received=None,
+                 template_args=None, errors=None):
+        # 不调用 super().__init__: DRF 的 ParamsErrorException 自己初始化 APIException
+        Exception.__init__(self)
+        self._message = message
+        self.template_args = template_args
+        self.code = code
+        self.param = param
+        self.expected = expected
+        self.received = received
+        self.errors = errors or []
+
+    @classmethod
+    def collect(cls, errors):
+        """ 把多个错误合并成一个 """
+        if len(errors) == 1:
+            return errors[0]
+        return cls(code=MULTIPLE, errors=errors)
+
+    @property
+    def message(self):
+        if self.template_args is not None:
+            self._message = self._message % self.template_args
+            self.template_args = None
+        if self._message is None:
+            if self.errors:
+                self._message = '; '.join(e.message for e in self.errors)
+            else:
+                return DEFAULT_MSG
+        return self._message
+
+    def as_dict(self):
+        """ {参数名: 错误信息} """
+        if self.errors:
+            result = {}
+            for e in self.errors:
+                result.update(e.as_dict())
+            return result
+        return {self.param: self.message}
+
+    def __str__(self):
+        return self.message
+
+    def __repr__(self):
+        return '<%s: %s %s>' % (self.__class__.__name__, self.code, self.param)
@@ -0,0 +1,200 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author  : wudizhangzhi
+"""
+可选的校验耗时和失败统计
+
+    from django_params_validator import instrumentation
+
+    sink = instrumentation.InMemorySink()
+    instrumentation.set_sink(sink)      # 在导入 view 之前设置, 例如在 settings 中
+
+    @Params(page=int, _name='book-list')  # 或者 _instrument=True 单独打开
+    def book_list(request, *args, **kwargs): ...
+
+    sink.render_prometheus()
+
+是否统计在构造 Params 时决定: 设置了 sink, 或者声明了 _instrument=True.
+没有打开统计的 Params 不会经过这里, 没有任何额外开销.
+
+每次校验会向 sink 发送 Measurement:
+    endpoint    Params 的名字(_name, 装饰器默认为 view 的 module.qualname)
+    param       参数名, 整个请求的统计为 None
+    seconds     耗时
+    error       失败时的错误类型(ParamsError.code), 成功为 None
+    size        many=True 时列表的长度
+sink 可以是任意接收 Measurement 的 callable, 例如转发到 statsd.
+"""
+import threading
+from collections import namedtuple
+from time import perf_counter
+
+Measurement = namedtuple('Measurement', ['endpoint', 'param', 'seconds', 'error', 'size'])
+
+_sink = None
+
+
+def set_sink(sink):
+    """ 设置全局的 sink, None 表示关闭; 之后构造的 Params 默认打开统计 """
+    global _sink
+    _sink = sink
+
+
+def get_sink():
+    return _sink
+
+
+def is_enabled():
+    return _sink is not None
+
+
+def instrumented_check(params, validator, check):
+    """ 给单个参数的校验函数计时 """
+    name, many, error_class = validator.param_name, validator.many, params.error_class
+
+    def timed(request_data, is_get, kwargs):
+        sink = _sink
+        if sink is None:
+            return check(request_data, is_get, kwargs)
+        start = perf_counter()
+        try:
+            check(request_data, is_get, kwargs)
+        except error_class as e:
+            sink(Measurement(params.name, name, perf_counter() - start, e.code, None))
+            raise
+        size = len(kwargs[name]) if many and kwargs[name] is not None else None
+        sink(Measurement(params.name, name, perf_counter() - start, None, size))
+
+    return timed
+
+
+def instrumented_checks(params, checks):
+    """ [(validator, check)] 中的 check 换成计时的版本, AdaptiveOrder 和 collect_errors 仍按自己的顺序校验 """
+    return [(validator, instrumented_check(params, validator, check)) for validator, check in checks]
+
+
+def instrumented_validate(params, validate=None):
+    """
+    返回替换 params.validate 的函数, 统计整个请求;
+    validate 为 None 时逐个参数计时校验, 否则 validate 应该使用 instrumented_checks 包装的 check
+    """
+    error_class = params.error_class
+    if validate is None:
+        validate = check_all(params, instrumented_checks(params, params.param_checks()))
+
+    def instrumented(request_data, is_get=False, kwargs=None, identity_cache=None):
+        sink = _sink
+        if sink is None:
+            return validate(request_data, is_get, kwargs, identity_cache)
+        error = None
+        start = perf_counter()
+        try:
+            return validate(request_data, is_get, kwargs, identity_cache)
+        except error_class as e:
+            error = e.code
+            raise
+        finally:
+            sink(Measurement(params.name, None, perf_counter() - start, error, None))
+
+    return instrumented
+
+
+def check_all(params, checks):
+    """ 按顺序逐个参数校验, 第一个错误时抛出 """
+    def validate(request_data, is_get=False, kwargs=None, identity_cache=None):
+        if kwargs is None:
+            kwargs = {}
+        for _, check in checks:
+            check(request_data, is_get, kwargs)
+        if params._models or params._custom:
+            errors = params.finish(kwargs, identity_cache)
+            if errors:
+                raise params.error_class.collect(errors)
+        return kwargs
+
+    return validate
+
+
+class Histogram(object):
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * len(buckets)
+        self.sum = 0
+        self.count = 0
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+
+class InMemorySink(object):
+    """ 在内存中汇总的 sink, 用于测试或者通过 render_prometheus 暴露 """
+    LATENCY_BUCKETS = (0.00001, 0.00005, 0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, float('inf'))
+    SIZE_BUCKETS = (10, 100, 1000, 10000, 100000, float('inf'))
+
+    def __init__(self, latency_buckets=None, size_buckets=None):
+        self.latency_buckets = latency_buckets or self.LATENCY_BUCKETS
+        self.size_buckets = size_buckets or self.SIZE_BUCKETS
+        # {(endpoint, param): Histogram}, param 为 None 是整个请求
+        self.latency = {}
+        # {(endpoint, param, error): count}
+        self.failures = {}
+        # {(endpoint, param): Histogram}
+        self.sizes = {}
+        self.lock = threading.Lock()
+
+    def __call__(self, measurement):
+        key = (measurement.endpoint, measurement.param)
+        with self.lock:
+            if key not in self.latency:
+                self.latency[key] = Histogram(self.latency_buckets)
+            self.latency[key].observe(measurement.seconds)
+            if measurement.error is not None:
+                failure = key + (measurement.error,)
+                self.failures[failure] = self.failures.get(failure, 0) + 1
+            if measurement.size is not None:
+                if key not in self.sizes:
+                    self.sizes[key] = Histogram(self.size_buckets)
+                self.sizes[key].observe(measurement.size)
+
+    def render_prometheus(self, prefix='params_validation'):
+        """ Prometheus 文本格式 """
+        lines = []
+        with self.lock:
+            lines.append('# TYPE %s_seconds histogram' % prefix)
+            for key, histogram in sorted(self.latency.items(), key=_sort_key):
+                lines.extend(_render_histogram('%s_seconds' % prefix, _labels(*key), histogram))
+            lines.append('# TYPE %s_failures_total counter' % prefix)
+            for (endpoint, param, error), count in sorted(self.failures.items(), key=_sort_key):
+                lines.append('%s_failures_total{%s} %d' % (prefix, _labels(endpoint, param, error), count))
+            lines.append('# TYPE %s_items histogram' % prefix)
+            for key, histogram in sorted(self.sizes.items(), key=_sort_key):
+                lines.extend(_render_histogram('%s_items' % prefix, _labels(*key), histogram))
+        return '\n'.join(lines) + '\n'
+
+
+def _sort_key(item):
+    return tuple('' if k is None else str(k) for k in item[0])
+
+
+def _labels(endpoint, param, error=None):
+    labels = [('endpoint', endpoint), ('param', param)]
+    if error is not None:
+        labels.append(('error', error))
+    return ','.join('%s="%s"' % (k, '' if v is None else str(v).replace('"', '\\"')) for k, v in labels)
+
+
+def _render_histogram(name, labels, histogram):
+    lines = []
+    cumulative = 0
+    for bound, count in zip(histogram.buckets, histogram.counts):
+        cumulative += count
+        le = '+Inf' if bound == float('inf') else repr(bound)
+        lines.append('%s_bucket{%s,le="%s"} %d' % (name, labels, le, cumulative))
+    lines.append('%s_sum{%s} %r' % (name, labels, histogram.sum))
+    lines.append('%s_count{%s} %d' % (name, labels, histogram.count))
+    return lines
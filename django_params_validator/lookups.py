@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author  : wudizhangzhi
+"""
+model 参数: 把请求中的主键(或 field 指定的字段)换成 model 实例传给 view
+
+    @Params(author=Author, books=Book, books__many=True, books__field='slug', books__only=('slug', 'title'))
+
+每个请求中同一个 model 和 field 的所有参数合并成一次 filter(field__in=keys) 查询,
+many=True 不会逐个 get(). 找不到的值一起报告(code='not_found').
+
+identity_cache 是 {(model, field): {str(key): instance}}, 同一个请求里多次校验共享,
+已经查询到的行不再查询; 按其它 field 查询到的实例也会以 pk 登记.
+
+查询之前用 model 字段的 to_python 转换 key, 不能转换的值报告为 code='type',
+不会因为 'abc' 查询整数主键而抛出 ValueError(500). filter() 仍然拒绝的 key 当作找不到.
+
+这里不导入 Django(只在转换失败时导入 ValidationError), 只使用 model._meta 和 model._default_manager 的 only(), filter().
+"""
+from .errors import NOT_FOUND, NOT_FOUND_MSG, TYPE, TYPE_MSG, ITERABLE_MSG
+
+PK = 'pk'
+
+
+def is_model(param_type):
+    """ Django 的 model 类都有 _default_manager """
+    return isinstance(param_type, type) and hasattr(param_type, '_default_manager')
+
+
+def key_field(model, field):
+    """ 转换 key 的 model 字段, 没有 _meta 的 model 返回 None """
+    meta = getattr(model, '_meta', None)
+    if meta is None:
+        return None
+    return meta.pk if field == PK else meta.get_field(field)
+
+
+def lookup_errors(model):
+    """ key 不合法时 to_python 或者 filter() 抛出的异常 """
+    if getattr(model, '_meta', None) is None:
+        return ValueError, TypeError
+    from django.core.exceptions import ValidationError
+    return ValueError, TypeError, ValidationError
+
+
+def resolve_instances(validators, kwargs, error_class, identity_cache=None):
+    """ 把 kwargs 中 model 参数的值换成实例, 返回所有错误的列表 """
+    if identity_cache is None:
+        identity_cache = {}
+    errors = []
+    # {(model, field): [{str(key): key}, only]}, only 为 None 表示加载所有字段
+    groups = {}
+    params = []
+    for validator in validators:
+        value = kwargs.get(validator.param_name)
+        if value is None:
+            continue
+        if validator.many:
+            if isinstance(value, (str, bytes)) or not hasattr(value, '__iter__'):
+                errors.append(error_class(ITERABLE_MSG, TYPE, validator.param_name, 'iterable', value,
+                                          template_args=(validator.param_name, type(value).__name__)))
+                continue
+            keys = list(value)
+        else:
+            keys = [value]
+        group = (validator.model, validator.field or PK)
+        field = key_field(*group)
+        if field is not None:
+            try:
+                keys = [field.to_python(key) for key in keys]
+            except lookup_errors(group[0]):
+                expected = '%s.%s' % (group[0].__name__, group[1])
+                errors.append(error_class(TYPE_MSG, TYPE, validator.param_name, expected, value,
+                                          template_args=(validator.param_name, expected, type(value).__name__)))
+                continue
+        params.append((validator, group, keys))
+        if group not in groups:
+            groups[group] = [{}, set()]
+        pending, only = groups[group]
+        for key in keys:
+            pending[str(key)] = key
+        if validator.only is None or only is None:
+            groups[group][1] = None
+        else:
+            only.update(validator.only)
+
+    for (model, field), (pending, only) in groups.items():
+        cached = identity_cache.setdefault((model, field), {})
+        keys = [key for s, key in pending.items() if s not in cached]
+        if not keys:
+            continue
+        queryset = model._default_manager
+        if only is not None:
+            queryset = queryset.only(*(only | {field}))
+        try:
+            instances = list(queryset.filter(**{field + '__in': keys}))
+        except lookup_errors(model):
+            # key 和字段的类型不符, 都当作找不到
+            continue
+        for instance in instances:
+            cached[str(getattr(instance, field))] = instance
+            if field != PK:
+                identity_cache.setdefault((model, PK), {})[str(instance.pk)] = instance
+
+    for validator, group, keys in params:
+        cached = identity_cache[group]
+        not_found = [key for key in keys if str(key) not in cached]
+        name = validator.param_name
+        if not_found:
+            errors.append(error_class(NOT_FOUND_MSG, NOT_FOUND, name, group[0].__name__, not_found,
+                                      template_args=(name, ', '.join(str(key) for key in not_found))))
+        elif validator.many:
+            kwargs[name] = [cached[str(key)] for key in keys]
+        else:
+            kwargs[name] = cached[str(keys[0])]
+    return errors
@@ -0,0 +1,27 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author  : wudizhangzhi
+"""
+python manage.py replay_params traffic.jsonl [--workers 4] [--repeat 10]
+
+用抓取的请求(JSONL 或者 HAR)重放所有 view 的参数校验, 报告吞吐, 延迟的百分位数, 最慢的接口和参数.
+见 replay.py.
+"""
+from django.core.management.base import BaseCommand
+
+from ...replay import replay
+
+
+class Command(BaseCommand):
+    help = '用抓取的请求重放参数校验, 报告吞吐, 延迟的百分位数, 最慢的接口和参数'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='JSONL 或者 HAR 文件')
+        parser.add_argument('--urlconf', default=None, help='默认为 settings.ROOT_URLCONF')
+        parser.add_argument('--workers', type=int, default=None, help='进程池的大小, 默认单进程')
+        parser.add_argument('--repeat', type=int, default=1, help='每个请求重放的次数')
+        parser.add_argument('--top', type=int, default=10, help='报告最慢的接口和参数的个数')
+
+    def handle(self, *args, **options):
+        stats = replay(options['path'], options['urlconf'], options['workers'], repeat=options['repeat'])
+        self.stdout.write(stats.render(options['top']))
@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author  : wudizhangzhi
+"""
+python manage.py warmup_params
+
+构造并编译 URLconf 中所有 view 的 Params, 报告每个接口的参数个数, 声明的问题和校验一组示例参数的耗时.
+需要把 django_params_validator 加入 INSTALLED_APPS.
+"""
+from django.core.management.base import BaseCommand, CommandError
+
+from ...audit import DEFAULT_NUMBER
+from ...warmup import warm_up
+
+
+class Command(BaseCommand):
+    help = '构造并编译所有 view 的 Params, 报告参数个数, 声明的问题和校验耗时'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--urlconf', default=None, help='默认为 settings.ROOT_URLCONF')
+        parser.add_argument('--number', type=int, default=DEFAULT_NUMBER, help='测量耗时时校验的次数, 0 表示只构造不测量')
+        parser.add_argument('--strict', action='store_true', help='有声明的问题时退出码不为 0')
+
+    def handle(self, *args, **options):
+        if options['number'] < 0:
+            raise CommandError('--number must be >= 0')
+        reports = warm_up(options['urlconf'], options['number'])
+        problems = 0
+        for report in reports:
+            cost = '-' if report.seconds is None else '%.2f us' % (report.seconds * 1e6)
+            self.stdout.write('%-40s %-40s %3d params  %-10s %s' % (
+                report.route, report.endpoint, report.params,
+                'compiled' if report.compiled else 'interpreted', cost))
+            for problem in report.problems:
+                self.stdout.write(self.style.WARNING('    %s' % problem))
+            problems += len(report.problems)
+        self.stdout.write('%d Params, %d problems' % (len(reports), problems))
+        if problems and options['strict']:
+            raise CommandError('%d problems in Params declarations' % problems)
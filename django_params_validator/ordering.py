@@ -0,0 +1,116 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author  : wudizhangzhi
+"""
+参数的校验顺序
+
+_order='cost'(默认): 装饰时排序, 必填(optional=False 且没有 default)的参数在前, 然后按估计的开销从小到大,
+    缺少必填参数或者简单参数错误的请求不必先转换长列表, 解析日期等.
+_order='declared': 按声明的顺序.
+_order='adaptive': 从 cost 的顺序开始, 按实际的失败率和耗时调整顺序:
+    每个参数按 平均耗时 / 失败率 从小到大排序, 即最可能以最小的开销拒绝请求的参数在前.
+    每 ADAPT_INTERVAL 个请求调整一次, 每 SAMPLE_EVERY 个请求计时一次; 统计不加锁, 是近似值.
+
+_collect_errors 时所有参数都要校验, 按声明的顺序报告错误.
+"""
+from functools import partial
+from time import perf_counter
+
+from .choices import ChoiceSource
+
+ORDERS = ('cost', 'declared', 'adaptive')
+
+ADAPT_INTERVAL = 1000
+SAMPLE_EVERY = 16
+
+# 估计的单个值的开销, 只用于排序
+COST_SIMPLE = 1
+COST_CHOICES = 2
+COST_CHOICE_SOURCE = 5
+COST_DATETIME = 5
+COST_MODEL = 20
+# many=True 的列表长度未知, 按 10 个元素估计
+COST_MANY = 10
+
+
+def estimate_cost(validator, params_cls):
+    if validator.model is not None:
+        cost = COST_MODEL
+    elif validator.param_type == params_cls.DATETIME_STR:
+        cost = COST_DATETIME
+    elif isinstance(validator.choices, ChoiceSource):
+        cost = COST_CHOICE_SOURCE
+    elif validator.choices:
+        cost = COST_CHOICES
+    else:
+        cost = COST_SIMPLE
+    if validator.many:
+        cost *= COST_MANY
+    return cost
+
+
+def is_required(validator):
+    return not validator.optional and validator.default is None
+
+
+def cost_order(validators, params_cls):
+    """ 必填的参数在前, 然后按估计的开销; 开销相同时保持声明的顺序 """
+    validators = list(validators)
+    return sorted(validators, key=lambda v: (not is_required(v), estimate_cost(v, params_cls)))
+
+
+class AdaptiveOrder(object):
+    """ 替换 Params.validate, 按统计的失败率和耗时调整参数的顺序 """
+
+    def __init__(self, params, interval=ADAPT_INTERVAL, sample_every=SAMPLE_EVERY, checks=None):
+        self.params = params
+        self.interval = interval
+        self.sample_every = sample_every
+        # [check], check 是 (validator, check); 打开统计时是计时的 check
+        self.checks = params.param_checks() if checks is None else checks
+        n = len(self.checks)
+        self.calls = [0] * n
+        self.failures = [0] * n
+        self.seconds = [0.0] * n
+        self.timed = [0] * n
+        # self.checks 的下标
+        self.order = list(range(n))
+        self.requests = 0
+
+    def validate(self, request_data, is_get=False, kwargs=None, identity_cache=None):
+        if kwargs is None:
+            kwargs = {}
+        self.requests += 1
+        sample = self.requests % self.sample_every == 0
+        for i in self.order:
+            self.calls[i] += 1
+            check = self.checks[i][1]
+            start = perf_counter() if sample else None
+            try:
+                check(request_data, is_get, kwargs)
+            except self.params.error_class:
+                self.failures[i] += 1
+                self.maybe_adapt()
+                raise
+            if sample:
+                self.seconds[i] += perf_counter() - start
+                self.timed[i] += 1
+        self.maybe_adapt()
+        if self.params._models or self.params._custom:
+            errors = self.params.finish(kwargs, identity_cache)
+            if errors:
+                raise self.params.error_class.collect(errors)
+        return kwargs
+
+    def maybe_adapt(self):
+        if self.requests % self.interval == 0:
+            self.adapt()
+
+    def rank(self, i):
+        # 平均耗时 / 失败率(加一平滑), 越小越应该先校验
+        seconds = self.seconds[i] / self.timed[i] if self.timed[i] else 0.0
+        failure_rate = (self.failures[i] + 1.0) / (self.calls[i] + 2.0)
+        return seconds / failure_rate
+
+    def adapt(self):
+        self.order = sorted(self.order, key=partial(self.rank))
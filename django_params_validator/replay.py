@@ -0,0 +1,257 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author  : wudizhangzhi
+"""
+用抓取的真实请求重放校验, 离线测量校验的吞吐和延迟
+
+    python manage.py replay_params traffic.jsonl --workers 4
+
+    from django_params_validator.replay import replay
+    stats = replay('traffic.har', max_workers=4)
+    print(stats.render())
+
+支持两种文件:
+    JSONL   每行一个请求 {"method": "GET", "path": "/books/1/", "query": "page=2" 或 {"page": "2"},
+                          "body": {...} 或字符串, "content_type": "application/json",
+                          "headers": {...}, "cookies": {...}}
+    HAR     浏览器或代理导出的 {"log": {"entries": [{"request": {...}}]}}
+
+每个请求按 path 在 URLconf 中找到 view, 以及按请求方法会执行的 Params (见 warmup.request_params),
+只运行校验: 和 check_request 一样选择 GET 参数, 请求体或者参数声明的来源, 不查询 model, 不运行自定义的 validator,
+不需要数据库, 也不调用 view.
+
+每个 Params 运行两遍: 一遍是请求实际使用的校验函数(编译的或者解释执行), 计入请求的耗时;
+一遍逐个参数单独校验, 用于找出最慢的参数.
+max_workers 时按 chunk_size 分块交给进程池, 子进程自己解析 URLconf, 需要 fork 启动(Linux 默认),
+或者设置了 DJANGO_SETTINGS_MODULE; 这时 urlconf 只能是模块名.
+"""
+import json
+import math
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+from urllib.parse import urlsplit
+
+from .sources import QUERY, BODY
+from .warmup import request_params
+
+Record = namedtuple('Record', ['method', 'path', 'query', 'body', 'content_type', 'headers', 'cookies'])
+# 一个请求的校验: endpoint 为 '请求方法 route', params 为 (((Params 的名字, 参数名), 耗时), ...)
+Sample = namedtuple('Sample', ['endpoint', 'seconds', 'params', 'error'])
+Summary = namedtuple('Summary', ['name', 'count', 'mean', 'p50', 'p99', 'failures'])
+
+DEFAULT_CHUNK_SIZE = 1000
+PERCENTILES = (50, 90, 99)
+
+
+def load(path):
+    """ 读取 JSONL 或者 HAR 文件, 返回 [Record] """
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    try:
+        data = json.loads(text)
+    except ValueError:
+        data = None
+    if isinstance(data, dict) and 'log' in data:
+        return [har_record(entry['request']) for entry in data['log']['entries']]
+    return [jsonl_record(json.loads(line)) for line in text.splitlines() if line.strip()]
+
+
+def jsonl_record(item):
+    path, query = item['path'], item.get('query')
+    if query is None and '?' in path:
+        path, query = path.split('?', 1)
+    return Record(item.get('method', 'GET').upper(), path, query or '', item.get('body'),
+                  item.get('content_type', 'application/json'), item.get('headers') or {}, item.get('cookies') or {})
+
+
+def har_record(request):
+    url = urlsplit(request['url'])
+    post = request.get('postData') or {}
+    body = post.get('text')
+    if not body and post.get('params'):
+        # multipart / form 的字段
+        body = dict((p['name'], p.get('value', '')) for p in post['params'])
+    headers = dict((h['name'], h['value']) for h in request.get('headers') or ())
+    cookies = dict((c['name'], c['value']) for c in request.get('cookies') or ())
+    return Record(request['method'].upper(), url.path, url.query, body, post.get('mimeType', ''), headers, cookies)
+
+
+def query_dict(query):
+    from django.http import QueryDict
+    if isinstance(query, str):
+        return QueryDict(query)
+    result = QueryDict(mutable=True)
+    for key, value in query.items():
+        result.setlist(key, value if isinstance(value, list) else [value])
+    return result
+
+
+def request_data(record):
+    """ (request.GET, request.data) """
+    body = record.body
+    if isinstance(body, str):
+        if 'json' in (record.content_type or ''):
+            body = json.loads(body) if body else {}
+        else:
+            body = query_dict(body)
+    elif body is None:
+        body = {}
+    return query_dict(record.query), body
+
+
+class ReplayRequest(object):
+    """ 重放的请求, 提供参数的来源(sources.py)读取的属性 """
+
+    def __init__(self, record):
+        self.GET, self.data = request_data(record)
+        self.META = dict(('HTTP_' + k.upper().replace('-', '_'), v) for k, v in record.headers.items())
+        self.COOKIES = record.cookies
+
+
+def replay_one(record, urlconf=None, checks_cache=None):
+    """ 校验一个请求, 返回 Sample; URLconf 中找不到时返回 None """
+    from django.urls import resolve, Resolver404
+    try:
+        match = resolve(record.path, urlconf)
+    except Resolver404:
+        return None
+    if checks_cache is None:
+        checks_cache = {}
+    request = ReplayRequest(record)
+    seconds = 0.0
+    timings = []
+    error = None
+    for params in request_params(match.func, record.method):
+        params.build()
+        default = QUERY if record.method == 'GET' or params._stream is not None else BODY
+        if params._sources is not None:
+            data, is_get = params._sources.data(request, match.kwargs, default), True
+        elif default == QUERY:
+            data, is_get = request.GET, True
+        else:
+            data, is_get = request.data, False
+        run = params._compiled or params.interpret
+        start = perf_counter()
+        try:
+            run(data, is_get, dict(match.kwargs))
+        except params.error_class as e:
+            error = e.code
+        seconds += perf_counter() - start
+
+        checks = checks_cache.get(id(params))
+        if checks is None:
+            checks = checks_cache.setdefault(id(params), (params, params.param_checks()))
+        kwargs = dict(match.kwargs)
+        for validator, check in checks[1]:
+            start = perf_counter()
+            try:
+                check(data, is_get, kwargs)
+            except params.error_class:
+                break
+            finally:
+                timings.append(((params.name, validator.param_name), perf_counter() - start))
+        if error is not None:
+            break
+    return Sample('%s %s' % (record.method, match.route), seconds, tuple(timings), error)
+
+
+def replay_chunk(records, urlconf=None, repeat=1):
+    checks_cache = {}
+    return [replay_one(record, urlconf, checks_cache) for _ in range(repeat) for record in records]
+
+
+def replay(records, urlconf=None, max_workers=None, chunk_size=None, repeat=1, executor=None):
+    """ records: 文件路径或者 [Record]; repeat: 每个请求重放的次数; 返回 ReplayStats """
+    if isinstance(records, str):
+        records = load(records)
+    start = perf_counter()
+    if max_workers or executor is not None:
+        chunk_size = chunk_size or DEFAULT_CHUNK_SIZE
+        chunks = [records[i:i + chunk_size] for i in range(0, len(records), chunk_size)]
+        own_executor = executor is None
+        if own_executor:
+            executor = ProcessPoolExecutor(max_workers=max_workers)
+        try:
+            futures = [executor.submit(replay_chunk, chunk, urlconf, repeat) for chunk in chunks]
+            results = []
+            for future in futures:
+                results.extend(future.result())
+        finally:
+            if own_executor:
+                executor.shutdown()
+    else:
+        results = replay_chunk(records, urlconf, repeat)
+    return ReplayStats(results, perf_counter() - start)
+
+
+def percentile(values, q):
+    """ 已排序的 values 的第 q 百分位数(nearest rank) """
+    if not values:
+        return None
+    return values[max(0, min(len(values) - 1, int(math.ceil(q / 100.0 * len(values))) - 1))]
+
+
+def summarize(name, seconds, failures=0):
+    seconds = sorted(seconds)
+    return Summary(name, len(seconds), sum(seconds) / len(seconds), percentile(seconds, 50),
+                   percentile(seconds, 99), failures)
+
+
+class ReplayStats(object):
+    """
+    samples: 每个请求的 Sample
+    unresolved: URLconf 中找不到的请求数
+    wall_seconds: 重放的总时间, 包括读取 URLconf, 构造请求参数等
+    throughput: 每秒校验的请求数(只算校验的耗时, 单核)
+    """
+
+    def __init__(self, results, wall_seconds):
+        self.samples = [sample for sample in results if sample is not None]
+        self.unresolved = len(results) - len(self.samples)
+        self.wall_seconds = wall_seconds
+        self.seconds = sorted(sample.seconds for sample in self.samples)
+        total = sum(self.seconds)
+        self.throughput = len(self.samples) / total if total else None
+        self.failures = sum(1 for sample in self.samples if sample.error is not None)
+
+    def percentiles(self):
+        """ {百分位: 请求的校验耗时} """
+        return dict((q, percentile(self.seconds, q)) for q in PERCENTILES)
+
+    def endpoints(self):
+        """ 每个接口的 Summary, 按平均耗时从大到小 """
+        seconds, failures = {}, {}
+        for sample in self.samples:
+            seconds.setdefault(sample.endpoint, []).append(sample.seconds)
+            if sample.error is not None:
+                failures[sample.endpoint] = failures.get(sample.endpoint, 0) + 1
+        return sorted((summarize(name, values, failures.get(name, 0)) for name, values in seconds.items()),
+                      key=lambda s: s.mean, reverse=True)
+
+    def params(self):
+        """ 每个参数的 Summary, name 为 (Params 的名字, 参数名), 按平均耗时从大到小 """
+        seconds = {}
+        for sample in self.samples:
+            for key, value in sample.params:
+                seconds.setdefault(key, []).append(value)
+        return sorted((summarize(name, values) for name, values in seconds.items()),
+                      key=lambda s: s.mean, reverse=True)
+
+    def render(self, top=10):
+        lines = ['%d requests, %d unresolved, %d rejected, %.3f s' % (
+            len(self.samples), self.unresolved, self.failures, self.wall_seconds)]
+        if not self.samples:
+            return '\n'.join(lines)
+        lines.append('throughput: %.0f validations/s' % self.throughput if self.throughput else 'throughput: -')
+        lines.append('latency: ' + '  '.join('p%d %.2f us' % (q, value * 1e6)
+                                             for q, value in sorted(self.percentiles().items())))
+        lines.append('slowest endpoints:')
+        for s in self.endpoints()[:top]:
+            lines.append('    %-50s %6d  mean %8.2f us  p99 %8.2f us  rejected %d' % (
+                s.name, s.count, s.mean * 1e6, s.p99 * 1e6, s.failures))
+        lines.append('slowest params:')
+        for s in self.params()[:top]:
+            lines.append('    %-50s %6d  mean %8.2f us  p99 %8.2f us' % (
+                '%s.%s' % s.name, s.count, s.mean * 1e6, s.p99 * 1e6))
+        return '\n'.join(lines)
@@ -0,0 +1,150 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author  : wudizhangzhi
+"""
+流式校验 JSON 数组的请求体
+
+    @Params(points=float, points__many=True, points__stream=True, points__lte=1000000, source=str)
+    def ingest(request, *args, **kwargs):
+        for point in kwargs['points']:  # generator, 逐个读取并校验
+            ...
+
+stream=True 时 POST 不读取 request.data: 请求体必须是一个 JSON 数组, 从 request.stream 分块读取,
+每个元素校验后交给 view, 内存占用与请求体大小无关. 其它参数从 query string 获取.
+遇到第一个错误的元素时在 view 的迭代中抛出错误; lt/lte 在读取过程中限制元素个数, gt/gte 在读完时检查.
+"""
+from .errors import MISSING, MISSING_MSG, TYPE, STREAM_MSG
+
+CHUNK_SIZE = 64 * 1024
+# 一个元素最多的字符数, 超过时不再读取, 缓冲区的大小与请求体大小无关
+MAX_ELEMENT_SIZE = 1024 * 1024
+# 最长的 JSON 字面量('-Infinity'), 在缓冲区末尾这么近的解析错误可能只是被截断了
+LITERAL_SIZE = 9
+WHITESPACE = ' \t\n\r'
+# 元素后面可以出现的字符
+DELIMITERS = WHITESPACE + ',]'
+
+
+class JsonArrayReader(object):
+    """ 从文件对象中逐个读取 JSON 数组的元素, 格式错误抛出 ValueError """
+
+    def __init__(self, fp, chunk_size=CHUNK_SIZE, max_element_size=MAX_ELEMENT_SIZE):
+        # 第一次流式读取时才导入
+        import codecs
+        import json
+        self.fp = fp
+        self.chunk_size = chunk_size
+        self.max_element_size = max_element_size
+        self.decoder = codecs.getincrementaldecoder('utf-8')()
+        self.json = json.JSONDecoder()
+        self.buf = ''
+        self.pos = 0
+        self.eof = fp is None
+
+    def read(self):
+        """ 读取下一块, 丢掉已经解析过的部分; 没有更多数据时返回 False """
+        if self.eof:
+            return False
+        chunk = self.fp.read(self.chunk_size)
+        if not chunk:
+            self.eof = True
+            self.buf += self.decoder.decode(b'', final=True)
+            return False
+        self.buf = self.buf[self.pos:] + self.decoder.decode(chunk)
+        self.pos = 0
+        return True
+
+    def peek(self):
+        """ 跳过空白, 返回下一个字符, 结束时返回 '' """
+        while True:
+            while self.pos < len(self.buf) and self.buf[self.pos] in WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.buf):
+                return self.buf[self.pos]
+            if not self.read():
+                return ''
+
+    def start(self):
+        """ 读取开头的 '[', 请求体为空时返回 False """
+        c = self.peek()
+        if c == '':
+            return False
+        if c != '[':
+            raise ValueError('expected a JSON array')
+        self.pos += 1
+        return True
+
+    def decode(self):
+        self.peek()
+        while True:
+            if len(self.buf) - self.pos > self.max_element_size:
+                raise ValueError('array element is longer than %d characters' % self.max_element_size)
+            try:
+                value, end = self.json.raw_decode(self.buf, self.pos)
+            except ValueError as e:  # json.JSONDecodeError
+                # 只有错误出现在缓冲区末尾(元素可能被截断)时才继续读取, 否则立即抛出
+                if self.truncated(e) and self.read():
+                    continue
+                raise
+            # 块末尾的数字可能被截断(例如 '12' 或 '-0.'), 后面是分隔符时才是完整的元素
+            if (end < len(self.buf) and self.buf[end] in DELIMITERS) or not self.read():
+                self.pos = end
+                return value
+
+    def truncated(self, e):
+        return e.pos >= len(self.buf) - LITERAL_SIZE or e.msg.startswith('Unterminated string')
+
+    def __iter__(self):
+        if self.peek() == ']':
+            self.pos += 1
+            return
+        while True:
+            yield self.decode()
+            c = self.peek()
+            if c == ']':
+                self.pos += 1
+                return
+            if c != ',':
+                raise ValueError('expected "," or "]" at %r' % c)
+            self.pos += 1
+
+
+def stream_error(validator, error_class, exc):
+    name = validator.param_name
+    return error_class(STREAM_MSG, TYPE, name, 'JSON array', None, template_args=(name, exc))
+
+
+def open_stream(validator, fp, error_class):
+    """ 读取数组的开头, 返回逐个校验元素的 generator; 请求体为空或者不是数组时直接抛出错误 """
+    reader = JsonArrayReader(fp)
+    try:
+        started = reader.start()
+    except ValueError as e:
+        raise stream_error(validator, error_class, e)
+    if started:
+        return iter_validated(validator, reader, error_class)
+    if validator.default is not None:
+        return iter(validator.default)
+    if validator.optional:
+        return iter(())
+    name = validator.param_name
+    raise error_class(MISSING_MSG, MISSING, name, template_args=(name,))
+
+
+def iter_validated(validator, reader, error_class):
+    items = iter(reader)
+    index = 0
+    while True:
+        try:
+            item = next(items)
+        except StopIteration:
+            break
+        except ValueError as e:
+            raise stream_error(validator, error_class, e)
+        # 元素个数超过 max_items, lt/lte 时不再继续读取
+        if validator.max_items is not None and index >= validator.max_items:
+            raise validator.max_items_error(index + 1)
+        validator.check_bounds(index + 1, validator.param_name, validator.lt, validator.lte, None, None)
+        yield validator.check_item_val(validator.check_item(item, index), index)
+        index += 1
+    validator.check_bounds(index, validator.param_name, None, None, validator.gt, validator.gte)
@@ -0,0 +1,202 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author  : wudizhangzhi
+"""
+自定义的 validator
+
+    def tenant_exists(tenant_id):            # 可以是 async def
+        if not cache.get('tenant:%s' % tenant_id):
+            raise ValueError('no such tenant')
+
+    @Params(tenant=int, tenant__validator=tenant_exists, tags=str, tags__many=True, tags__validator=check_tags)
+
+validator 在内置的检查和 model 查询之后运行, 参数为转换后的值(many=True 时是整个列表), 值为 None 时不运行.
+返回值不是 None 时替换传给 view 的值; 抛出 ValueError 或 ParamsError 表示参数不合法(code='invalid').
+
+xx__cache_ttl=秒 缓存每个值的结果, 相同的值在 ttl 内不再调用 validator:
+    xx__cache_size          进程内缓存的个数(LRU), 默认 1024
+    xx__cache_negative_ttl  不通过的结果缓存的秒数, 默认是 cache_ttl 的 1/10, 0 表示不缓存
+    xx__cache_backend       Django cache 的名字, 例如 'default', 在多个进程之间共享
+    xx__cache_key_prefix    共享缓存的 key 前缀, 默认为 validator 的 module.qualname 和参数名; lambda 必须指定
+
+一个声明中有多个 validator 时并发运行:
+    同步的 view 使用共享的线程池(最多 MAX_WORKERS 个线程), async 的 validator 在一个事件循环中 gather;
+    async 的 view 中 async 的 validator 直接 gather, 同步的 validator 放到线程池中.
+
+asyncio, concurrent.futures 和 inspect 在第一次运行 validator 时才导入, 没有声明 validator 时不增加导入的时间.
+"""
+import threading
+from contextvars import ContextVar
+
+from .cache import negative_ttl
+from .errors import ParamsError, INVALID, INVALID_MSG
+
+MAX_WORKERS = 8
+
+# async view 的 wrapper 设置为 True: 同步的校验跳过 model 查询和 validator, 由 wrapper await afinish
+deferred = ContextVar('params_validators_deferred', default=False)
+
+_executor = None
+_lock = threading.Lock()
+
+
+def get_executor():
+    """ 共享的线程池, 第一次使用时创建 """
+    global _executor
+    if _executor is None:
+        from concurrent.futures import ThreadPoolExecutor
+        with _lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(max_workers=MAX_WORKERS, thread_name_prefix='params-validator')
+    return _executor
+
+
+def set_executor(executor):
+    """ 使用自己的线程池, 例如需要更多线程时 """
+    global _executor
+    _executor = executor
+
+
+def is_async(func):
+    from inspect import iscoroutinefunction
+    return iscoroutinefunction(func) or iscoroutinefunction(getattr(func, '__call__', None))
+
+
+def isawaitable(value):
+    from inspect import isawaitable
+    return isawaitable(value)
+
+
+def invalid(validator, value, message, error_class):
+    name = validator.param_name
+    return error_class(INVALID_MSG, INVALID, name, getattr(validator.validator, '__name__', None), value,
+                       template_args=(name, message))
+
+
+def error_message(exc):
+    return exc.message if isinstance(exc, ParamsError) else str(exc)
+
+
+def cache_key(value):
+    return tuple(value) if isinstance(value, list) else value
+
+
+def lookup(validator, value, error_class):
+    """ 缓存的结果 (新的值, 错误), 没有缓存时返回 None """
+    if validator.result_cache is None:
+        return None
+    try:
+        cached = validator.result_cache.get(cache_key(value))
+    except TypeError:  # 不能 hash 的值
+        return None
+    if cached is None:
+        return None
+    ok, result = cached
+    if ok:
+        return result, None
+    return value, invalid(validator, value, result, error_class)
+
+
+def remember(validator, value, ok, result):
+    """ 通过时 result 是新的值, 不通过时是错误信息 """
+    if validator.result_cache is None:
+        return
+    ttl = validator.cache_ttl if ok else negative_ttl(validator)
+    if not ttl:
+        return
+    try:
+        validator.result_cache.set(cache_key(value), (ok, result), ttl)
+    except TypeError:
+        pass
+
+
+def call(validator, value, error_class):
+    """ 同步调用, 返回 (新的值, 错误) """
+    cached = lookup(validator, value, error_class)
+    if cached is not None:
+        return cached
+    try:
+        result = validator.validator(value)
+        if isawaitable(result):
+            import asyncio
+            result = asyncio.run(_await(result))
+    except (ValueError, ParamsError) as e:
+        remember(validator, value, False, error_message(e))
+        return value, invalid(validator, value, error_message(e), error_class)
+    result = value if result is None else result
+    remember(validator, value, True, result)
+    return result, None
+
+
+async def _await(awaitable):
+    return await awaitable
+
+
+async def acall(validator, value, error_class):
+    import asyncio
+    cached = lookup(validator, value, error_class)
+    if cached is not None:
+        return cached
+    try:
+        if is_async(validator.validator):
+            result = await validator.validator(value)
+        else:
+            loop = asyncio.get_running_loop()
+            result = await loop.run_in_executor(get_executor(), validator.validator, value)
+            if isawaitable(result):
+                result = await result
+    except (ValueError, ParamsError) as e:
+        remember(validator, value, False, error_message(e))
+        return value, invalid(validator, value, error_message(e), error_class)
+    result = value if result is None else result
+    remember(validator, value, True, result)
+    return result, None
+
+
+def pending(validators, kwargs):
+    return [(validator, kwargs[validator.param_name]) for validator in validators
+            if kwargs.get(validator.param_name) is not None]
+
+
+def merge(jobs, results, kwargs):
+    """ 把新的值写入 kwargs, 按声明的顺序返回错误 """
+    errors = []
+    for (validator, _), (value, error) in zip(jobs, results):
+        if error is not None:
+            errors.append(error)
+        else:
+            kwargs[validator.param_name] = value
+    return errors
+
+
+async def _gather(jobs, error_class):
+    import asyncio
+    return await asyncio.gather(*[acall(validator, value, error_class) for validator, value in jobs])
+
+
+def run_validators(validators, kwargs, error_class):
+    """ 同步运行, 返回错误列表 """
+    jobs = pending(validators, kwargs)
+    if not jobs:
+        return []
+    if len(jobs) == 1 and not is_async(jobs[0][0].validator):
+        results = [call(jobs[0][0], jobs[0][1], error_class)]
+    else:
+        import asyncio
+        executor = get_executor()
+        async_jobs = [job for job in jobs if is_async(job[0].validator)]
+        futures = dict((id(job), executor.submit(call, job[0], job[1], error_class))
+                       for job in jobs if not is_async(job[0].validator))
+        # 所有 async 的 validator 在一个线程的事件循环中并发, 与同步的 validator 同时运行
+        gathered = executor.submit(asyncio.run, _gather(async_jobs, error_class)) if async_jobs else None
+        async_results = dict(zip([id(job) for job in async_jobs], gathered.result() if gathered else []))
+        results = [futures[id(job)].result() if id(job) in futures else async_results[id(job)] for job in jobs]
+    return merge(jobs, results, kwargs)
+
+
+async def arun_validators(validators, kwargs, error_class):
+    """ 在 async view 中运行, 返回错误列表 """
+    jobs = pending(validators, kwargs)
+    if not jobs:
+        return []
+    return merge(jobs, await _gather(jobs, error_class), kwargs)
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author  : wudizhangzhi
+"""
+int/float 的 many=True 参数可选的 numpy 批量校验
+
+    @Params(points=float, points__many=True, points__vectorize=True,
+            points__item_gte=0, points__item_lt=1000, points__ndarray=True)
+
+一次把列表转成 numpy 数组, 批量检查类型转换和每个元素的 item_lt/item_lte/item_gt/item_gte.
+转换失败(非数字, 空值, 溢出等)时交给纯 python 的列表校验函数, 由它给出具体是哪个元素出错.
+元素只能是字符串或者声明的类型本身, 否则(例如 float 参数混入 int, int 参数混入 bool)交给 python 校验,
+保证两种实现的结果一致. 数字字符串和数字混合的列表会整体按字符串转换.
+numpy 没有安装时 vectorized_list_checker 返回 None, 调用方继续使用纯 python 的实现.
+"""
+
+from .errors import RANGE, RANGE_MSGS
+
+# 小于该长度的列表直接用 python 校验, 转换数组的开销不划算
+MIN_SIZE = 256
+
+# 原始数组允许的 dtype.kind, 其它(object 等)交给 python 校验
+ACCEPTED_KINDS = {
+    int: 'iU',
+    float: 'fU',
+}
+BOUNDS = (
+    ('lt', 'less'),
+    ('lte', 'less_equal'),
+    ('gt', 'greater'),
+    ('gte', 'greater_equal'),
+)
+
+
+def import_numpy():
+    """ 只有声明了 vectorize=True 时才导入 numpy """
+    try:
+        import numpy
+    except ImportError:  # numpy 是可选依赖
+        return None
+    return numpy
+
+
+def vectorized_list_checker(validator, fallback, error_cls):
+    """
+    为 validator 生成基于 numpy 的列表校验函数
+    fallback: 纯 python 的列表校验函数, 用于小列表和无法批量转换的输入
+    """
+    if validator.param_type not in ACCEPTED_KINDS or validator.choices:
+        return None
+    numpy = import_numpy()
+    if numpy is None:
+        return None
+    dtype = numpy.int64 if validator.param_type is int else numpy.float64
+    kinds = ACCEPTED_KINDS[validator.param_type]
+    # 与 check_item 一致: 字符串先转换, 其它元素必须是 param_type 本身
+    item_types = {str, validator.param_type}
+    bounds = [(op, getattr(validator, 'item_' + op), getattr(numpy, ufunc)) for op, ufunc in BOUNDS
+              if getattr(validator, 'item_' + op) is not None]
+    param_name = validator.param_name
+    as_ndarray = validator.ndarray
+    # 'U' 数组每个字符 4 字节
+    max_itemsize = validator.max_length * 4 if validator.max_length is not None else None
+
+    def check_list(values):
+        if not as_ndarray and len(values) < MIN_SIZE:
+            return fallback(values)
+        try:
+            if not item_types.issuperset(map(type, values)):
+                raise TypeError
+            raw = numpy.asarray(values)
+            if raw.ndim != 1 or raw.dtype.kind not in kinds:
+                raise ValueError
+            if max_itemsize is not None and raw.dtype.kind == 'U' and raw.dtype.itemsize > max_itemsize:
+                raise ValueError  # 由 fallback 报告超过 max_length 的元素
+            arr = raw.astype(dtype, copy=False)
+        except (TypeError, ValueError, OverflowError):
+            values = fallback(values)
+            return numpy.asarray(values, dtype=dtype) if as_ndarray else values
+        for op, bound, ufunc in bounds:
+            bad = numpy.flatnonzero(~ufunc(arr, bound))
+            if len(bad):
+                label = '%s[%d]' % (param_name, bad[0])
+                raise error_cls(RANGE_MSGS[op], RANGE, label, (op, bound), arr[bad[0]].item(),
+                                template_args=(label, bound))
+        if as_ndarray:
+            return arr
+        return arr.tolist()
+
+    return check_list
@@ -0,0 +1,51 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author  : wudizhangzhi
+"""
+APIView / ViewSet 的类级别参数声明
+
+    class BookViewSet(ParamsViewMixin, viewsets.ModelViewSet):
+        action_params = {
+            'list': dict(page=int, page__default=1, ordering=('name', 'created')),
+            'retrieve': dict(expand=bool, expand__default=False),
+            'recommend': Params(limit=int, limit__lte=50),  # @action
+        }
+
+        def list(self, request, *args, **kwargs):
+            page = kwargs['page']
+
+所有声明在定义类的时候(__init_subclass__)编译一次, initial() 按 self.action
+(APIView 没有 action 时按请求方法, 如 'get') 直接找到对应的 Params 校验,
+校验后的参数写入 self.kwargs, 由 dispatch 作为 kwargs 传给处理函数.
+子类的 action_params 与父类的合并.
+"""
+from .drf import Params
+
+
+class ParamsViewMixin(object):
+    # {action 或请求方法: Params 或 Params 的参数 dict}
+    action_params = {}
+    # __init_subclass__ 中生成的 {action: Params}
+    params_plans = {}
+
+    def __init_subclass__(cls, **kwargs):
+        super(ParamsViewMixin, cls).__init_subclass__(**kwargs)
+        plans = {}
+        for base in reversed(cls.__mro__[1:]):
+            plans.update(getattr(base, 'params_plans', None) or {})
+        for action, spec in cls.__dict__.get('action_params', {}).items():
+            plan = spec if isinstance(spec, Params) else Params(**spec)
+            if plan.name is None:
+                plan.name = '%s.%s.%s' % (cls.__module__, cls.__qualname__, action)
+            plans[action] = plan
+        cls.params_plans = plans
+
+    def get_params_plan(self, request):
+        action = getattr(self, 'action', None) or request._request.method.lower()
+        return self.params_plans.get(action)
+
+    def initial(self, request, *args, **kwargs):
+        super(ParamsViewMixin, self).initial(request, *args, **kwargs)
+        plan = self.get_params_plan(request)
+        if plan is not None:
+            plan.check_request(request, self.kwargs)
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+# @Author  : wudizhangzhi
+"""
+在 fork worker 之前构造所有 view 的 Params
+
+_defer=True(或者 settings.PARAMS_VALIDATOR_DEFER = True)时, 导入 view 只保存声明,
+第一次校验时才生成 validator 并编译. 为了不让第一个请求承担编译的开销, 可以在 fork 之前调用:
+
+    # gunicorn.conf.py, preload_app = True
+    def when_ready(server):
+        from django_params_validator.warmup import warm_up
+        warm_up(freeze=True)
+
+构造好的 validator 和编译结果在 fork 之前生成, worker 之间写时复制共享;
+freeze=True 时调用 gc.freeze(), 之后的 gc 不再扫描(写入)这些对象.
+默认只构造不测量耗时, number=1000 时每个 Params 校验一组示例参数 1000 次并报告平均耗时.
+
+也可以用 manage.py warmup_params 检查所有接口的参数声明和校验耗时.
+"""
+import gc
+
+from .audit import audit
+
+
+def iter_patterns(patterns, prefix=''):
+    """ 遍历 URLconf, 返回 (route, view) """
+    for pattern in patterns:
+        route = prefix + str(pattern.pattern)
+        if hasattr(pattern, 'url_patterns'):  # include()
+            for item in iter_patterns(pattern.url_patterns, route):
+                yield item
+        else:
+            yield route, pattern.callback
+
+
+def view_params(view):
+    """ view 上的所有 Params: 装饰的函数, APIView / ViewSet 的处理函数和 ParamsViewMixin 的声明 """
+    found = [getattr(view, 'params', None)]
+    cls = getattr(view, 'cls', None) or getattr(view, 'view_class', None)
+    if cls is not None:
+        found.extend((getattr(cls, 'params_plans', None) or {}).values())
+        names = list(getattr(cls, 'http_method_names', ()))
+        # ViewSet 的 {请求方法: action}
+        names.extend((getattr(view, 'actions', None) or {}).values())
+        for name in names:
+            found.extend(handler_params(getattr(cls, name, None)))
+    result = []
+    for params in found:
+        if params is not None and not any(params is p for p in result):
+            result.append(params)
+    return result
+
+
+def request_params(view, method):
+    """ 处理 method 请求时依次校验的 Params """
+    params = getattr(view, 'params', None)
+    if params is not None:
+        return [params]
+    cls = getattr(view, 'cls', None) or getattr(view, 'view_class', None)
+    if cls is None:
+        return []
+    method = method.lower()
+    action = (getattr(view, 'actions', None) or {}).get(method, method)
+    found = []
+    plan = (getattr(cls, 'params_plans', None) or {}).get(action)
+    if plan is not None:
+        found.append(plan)
+    found.extend(handler_params(getattr(cls, action, None)))
+    return found
+
+
+def handler_params(handler):
+    params = getattr(handler, 'params', None)
+    if params is not None:
+        return [params]
+    # @api_view 生成的处理函数调用被装饰的函数, 从闭包中找
+    found = []
+    for cell in getattr(handler, '__closure__', None) or ():
+        try:
+            params = getattr(cell.cell_contents, 'params', None)
+        except ValueError:  # 空的 cell
+            continue
+        if params is not None:
+            found.append(params)
+    return found
+
+
+def warm_up(urlconf=None, number=0, freeze=False):
+    """ 构造 URLconf 中所有 view 的 Params, 返回每个 Params 的 audit.Report; number 大于 0 时测量校验耗时 """
+    from django.urls import get_resolver
+    reports = []
+    seen = set()
+    for route, view in iter_patterns(get_resolver(urlconf).url_patterns):
+        for params in view_params(view):
+            if id(params) in seen:
+                continue
+            seen.add(id(params))
+            reports.append(audit(params, route, number))
+    if freeze:
+        gc.collect()
+        gc.freeze()
+    return reports
@@ -37,11 +37,15 @@ setup(
         'Topic :: Software Development',
         'Topic :: Internet :: WWW/HTTP',
         'License :: OSI Approved :: MIT License',
-        'Programming Language :: Python :: 3.6',
+        'Programming Language :: Python :: 3.7',
     ],
+    python_requires='>=3.7',
     keywords='rest,django,api,params,parameters,djangorestframework,decorator',
 
     packages=find_packages(exclude=['tests']),
     install_requires=['django',
-                      'djangorestframework']
+                      'djangorestframework'],
+    extras_require={
+        'numpy': ['numpy'],
+    },
 )
@@ -8,8 +8,13 @@ from django.conf import settings
 if __name__ == '__main__':
     settings.configure()
     sys.path.append('..')
-    from django_params_validator import Params, ParamsErrorException
+    from django_params_validator import Params, ParamsErrorException, ParamsError, vectorized, datetimes
+    from django_params_validator import instrumentation, ChoiceSource
+    from django_params_validator.choices import SnapshotIndex
+    from django_params_validator.streaming import JsonArrayReader
+    from django_params_validator.views import ParamsViewMixin
 
+from django.test.utils import override_settings
 from rest_framework.response import Response
 
 
@@ -18,6 +23,7 @@ class _MockUserManager(object):
 
     _objects = {}
     _next_id = 1
+    queries = 0
 
     def create(self, **kwargs):
         """ Create a mocked model """
@@ -43,12 +49,20 @@ class _MockUserManager(object):
         """ Just no-op """
         return self
 
+    def filter(self, **kwargs):
+        """ Fake .filter(field__in=keys), counts the queries """
+        _MockUserManager.queries += 1
+        (lookup, keys), = kwargs.items()
+        field = lookup[:-len('__in')]
+        keys = set(str(k) for k in keys)
+        return [obj for obj in _MockUserManager._objects.values() if str(getattr(obj, field)) in keys]
+
 
 class _MockUser(object):
     """ A mock model to test that our Django model integration works correctly """
 
-    _default_manager = None  # @Params looks for this property to determine if the object if a Django model
     objects = _MockUserManager()
+    _default_manager = objects  # @Params looks for this property to determine if the object if a Django model
 
     name = None
     email = None
@@ -58,16 +72,63 @@ class _MockUser(object):
             setattr(self, k, v)
 
 
+# import django_params_validator 的时间上限(秒); 目标是 1 毫秒以内, 留出测量的抖动
+IMPORT_BUDGET = 0.002
+
+
+class _IntegerField(object):
+    """ Converts keys like a Django IntegerField """
+
+    def to_python(self, value):
+        from django.core.exceptions import ValidationError
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            raise ValidationError('invalid')
+
+
+class _CharField(object):
+    def to_python(self, value):
+        return value if isinstance(value, str) else str(value)
+
+
+class _StrictUserManager(_MockUserManager):
+    """ Rejects keys the lookup field cannot hold, like a real manager """
+
+    def filter(self, **kwargs):
+        (lookup, keys), = kwargs.items()
+        for key in keys:
+            if lookup == 'pk__in':
+                int(key)
+            elif not isinstance(key, str):
+                raise TypeError('unhashable type')
+        return _MockUserManager.filter(self, **kwargs)
+
+
+class _StrictUser(_MockUser):
+    """ A mock model with _meta, rejecting malformed keys """
+
+    objects = _StrictUserManager()
+    _default_manager = objects
+
+    class _meta(object):
+        pk = _IntegerField()
+
+        @staticmethod
+        def get_field(name):
+            return _CharField()
+
+
 class ParamDecoratorTest(unittest.TestCase):
     def setUp(self):
         pass
 
-    def do_fake_request(self, request_fn, expected_status=True, method_='GET', get={}, post={}):
-        """ Perform a fake request to a request fn, check that we got the status code we expected """
+    def make_fake_request(self, method_='GET', get={}, post={}):
+        """ Build a fake DRF request """
 
         class ListDict(dict):
             def getlist(self, key, default=None):
-                return [self[key]] if self[key] else default
+                return [self[key]] if self.get(key) else default
 
         class Req(object):
             method = 'GET'
@@ -89,7 +150,11 @@ class ParamDecoratorTest(unittest.TestCase):
         # Did we accidentally make one of these a set?
         self.assertTrue(isinstance(fake_request.GET, dict))
         self.assertTrue(isinstance(fake_request.data, dict))
+        return fake_request
 
+    def do_fake_request(self, request_fn, expected_status=True, method_='GET', get={}, post={}):
+        """ Perform a fake request to a request fn, check that we got the status code we expected """
+        fake_request = self.make_fake_request(method_, get, post)
         try:
             response = request_fn(fake_request)
             response_status = True
@@ -367,10 +432,10 @@ class ParamDecoratorTest(unittest.TestCase):
             return Response({'status': 'success'})
 
         # single val should work
-        # self.do_fake_request(my_request, get={'user_ids': 100})
-        #
-        # # multiple vals should work
-        # self.do_fake_request(my_request, get={'user_ids': '98,99,100'})
+        self.do_fake_request(my_request, get={'user_ids': 100})
+
+        # multiple vals should work
+        self.do_fake_request(my_request, get={'user_ids': '98,99,100'})
 
         # POST - single val
         self.do_fake_request(my_request, method_='POST', post={'user_ids': 100}, expected_status=False)
@@ -391,6 +456,47 @@ class ParamDecoratorTest(unittest.TestCase):
 
         self.do_fake_request(my_request, method_='POST', post={}, expected_status=True)
 
+    def test_date_parse(self):
+        """ Test that parsed datetimes can be passed to the view """
+        import datetime
+
+        for compile_ in (True, False):
+            @Params(start=Params.DATETIME_STR, start__format='%Y-%m-%d', start__parse='date',
+                    end=Params.DATETIME_STR, end__parse=True, end__parse_cache=16,
+                    at=Params.DATETIME_STR, at__format=Params.ISO_FORMAT, _compile=compile_)
+            def my_request(request, *args, **kwargs):
+                return Response(kwargs)
+
+            result = self.do_fake_request(my_request, get={'start': '2018-1-5', 'end': '2018-10-10 08:00:00',
+                                                           'at': '2018-10-10T08:00:00'})
+            self.assertEqual(result['start'], datetime.date(2018, 1, 5))
+            self.assertEqual(result['end'], datetime.datetime(2018, 10, 10, 8))
+            self.assertEqual(result['at'], '2018-10-10T08:00:00')
+            self.do_fake_request(my_request, get={'start': '2018-02-30'}, expected_status=False)
+            self.do_fake_request(my_request, get={'end': '2018-10-10'}, expected_status=False)
+            self.do_fake_request(my_request, get={'at': '10/10/2018'}, expected_status=False)
+            self.do_fake_request(my_request, method_='POST', post={'start': 20181010}, expected_status=False)
+            # JSON 中不是字符串的值
+            self.do_fake_request(my_request, method_='POST', post={'start': list('2018-10-10')}, expected_status=False)
+            self.do_fake_request(my_request, method_='POST', post={'end': list('2018-10-10 08:00:00')},
+                                 expected_status=False)
+
+    def test_date_parsers_match_strptime(self):
+        """ Test that the fast parsers accept exactly what strptime accepts """
+        import datetime
+
+        for fmt, samples in (('%Y-%m-%d', ['2018-10-10', '2018-1-5', '2018-13-01', '2018-10-1x', ' 2018-10-10']),
+                             ('%Y-%m-%d %H:%M:%S', ['2018-10-10 23:59:59', '2018-10-10 24:00:00',
+                                                    '2018-10-10T23:59:59', '2018-10-10 1:2:3'])):
+            parse = datetimes.get_parser(fmt)
+            for sample in samples:
+                try:
+                    expected = datetime.datetime.strptime(sample, fmt)
+                except ValueError:
+                    self.assertRaises(ValueError, parse, sample)
+                else:
+                    self.assertEqual(parse(sample), expected)
+
     def test_choices_set_null(self):
         @Params(test_choices=('days', 'weeks', 'months'), test_choices__many=True)
         def my_request(request, *args, **kwargs):
@@ -409,6 +515,993 @@ class ParamDecoratorTest(unittest.TestCase):
 
         self.do_fake_request(my_request, method_='GET', expected_status=True)
 
+    def test_range(self):
+        """ Test lt/lte/gt/gte, including zero bounds """
+
+        for compile_ in (True, False):
+            @Params(my_int=int, my_int__gte=0, my_int__lt=10, _compile=compile_)
+            def my_request(request, *args, **kwargs):
+                return Response({'result': kwargs.get('my_int')})
+
+            self.assertEqual(self.do_fake_request(my_request, get={'my_int': '0'})['result'], 0)
+            self.do_fake_request(my_request, expected_status=False, get={'my_int': '-1'})
+            self.do_fake_request(my_request, expected_status=False, get={'my_int': '10'})
+
+    def test_compiled_same_as_interpreted(self):
+        """ Test that the compiled validator returns the same kwargs and errors as the interpreter """
+        spec = dict(page=int, page__default=1, size=int, size__lte=100,
+                    ratio=float, flag=bool, flag__default=True,
+                    name=str, name__gte=2, color=('red', 'green'),
+                    ids=int, ids__many=True, day=Params.DATETIME_STR, day__format='%Y-%m-%d')
+        compiled = Params(**spec)
+        interpreted = Params(_compile=False, **spec)
+        self.assertIsNotNone(compiled._compiled)
+        self.assertIsNone(interpreted._compiled)
+
+        def view(request, *args, **kwargs):
+            return Response(kwargs)
+
+        cases = [
+            ('GET', {'ids': '3'}),
+            ('GET', {'ids': '3', 'page': '2', 'size': '50', 'flag': 'false', 'name': 'ab', 'color': 'red'}),
+            ('GET', {'ids': '3', 'size': '101'}),
+            ('GET', {'ids': 'x'}),
+            ('GET', {'ids': '3', 'color': 'blue'}),
+            ('GET', {'ids': '3', 'name': 'a'}),
+            ('GET', {'ids': '3', 'day': '2018-10-10'}),
+            ('GET', {'ids': '3', 'day': '2018/10/10'}),
+            ('POST', {'ids': [1, 2, '3'], 'ratio': '1.5'}),
+            ('POST', {'ids': 1}),
+            ('POST', {'ids': [1, 'a']}),
+        ]
+        for method, data in cases:
+            get, post = (data, {}) if method == 'GET' else ({}, data)
+            results = []
+            for params in (compiled, interpreted):
+                try:
+                    results.append(params(view)(self.make_fake_request(method, get, post)).data)
+                except ParamsErrorException as e:
+                    results.append(str(e))
+            self.assertEqual(results[0], results[1], (method, data))
+
+    def test_many_element_error(self):
+        """ Test that many=True reports which element is invalid """
+
+        for compile_ in (True, False):
+            @Params(ids=int, ids__many=True, _compile=compile_)
+            def my_request(request, *args, **kwargs):
+                return Response({'ids': kwargs.get('ids')})
+
+            self.assertEqual(self.do_fake_request(my_request, method_='POST', post={'ids': ['1', 2]})['ids'], [1, 2])
+            with override_settings(DEBUG=True):
+                msg = self.do_fake_request(my_request, method_='POST', post={'ids': [1, 2, 'x']},
+                                           expected_status=False)
+            self.assertIn('ids[2]', msg)
+
+        validator = Params(ids=int, ids__many=True)._validators['ids']
+        self.assertIsNotNone(validator.list_checker)
+        self.assertEqual(validator.check(['1', '2']), [1, 2])
+
+    def test_many_item_range(self):
+        """ Test item_gte/item_lt bound every element of a many=True param """
+
+        for compile_ in (True, False):
+            @Params(ids=int, ids__many=True, ids__item_gte=0, ids__item_lt=10, ids__lte=3, _compile=compile_)
+            def my_request(request, *args, **kwargs):
+                return Response({'ids': kwargs.get('ids')})
+
+            self.assertEqual(self.do_fake_request(my_request, method_='POST', post={'ids': ['0', 9]})['ids'], [0, 9])
+            self.do_fake_request(my_request, method_='POST', post={'ids': [1, 10]}, expected_status=False)
+            self.do_fake_request(my_request, method_='POST', post={'ids': [-1]}, expected_status=False)
+            self.do_fake_request(my_request, method_='POST', post={'ids': [1, 2, 3, 4]}, expected_status=False)
+
+    @unittest.skipUnless(vectorized.import_numpy(), 'numpy is not installed')
+    def test_many_vectorize(self):
+        """ Test the numpy engine for large numeric lists """
+        import numpy
+
+        @Params(points=float, points__many=True, points__vectorize=True, points__item_gte=0)
+        def my_request(request, *args, **kwargs):
+            return Response({'points': kwargs.get('points')})
+
+        points = [float(i) for i in range(1000)]
+        self.assertEqual(self.do_fake_request(my_request, method_='POST', post={'points': points})['points'], points)
+        strs = [str(p) for p in points]
+        self.assertEqual(self.do_fake_request(my_request, method_='POST', post={'points': strs})['points'], points)
+        with override_settings(DEBUG=True):
+            msg = self.do_fake_request(my_request, method_='POST', post={'points': points + [-1.0]},
+                                       expected_status=False)
+            self.assertIn('points[1000]', msg)
+            msg = self.do_fake_request(my_request, method_='POST', post={'points': strs + ['x']},
+                                       expected_status=False)
+            self.assertIn('points[1000]', msg)
+
+        @Params(ids=int, ids__many=True, ids__vectorize=True, ids__ndarray=True, ids__item_lt=5)
+        def my_request2(request, *args, **kwargs):
+            ids = kwargs.get('ids')
+            self.assertTrue(isinstance(ids, numpy.ndarray))
+            return Response({'ids': ids.tolist()})
+
+        self.assertEqual(self.do_fake_request(my_request2, method_='POST', post={'ids': ['1', '2']})['ids'], [1, 2])
+        self.do_fake_request(my_request2, method_='POST', post={'ids': [1, 5]}, expected_status=False)
+
+    @unittest.skipUnless(vectorized.import_numpy(), 'numpy is not installed')
+    def test_many_vectorize_mixed(self):
+        """ Test that the numpy engine agrees with the python engine on mixed lists """
+        for param_type, mixed in ((float, [1.5, '2', 3]), (float, [1.5, 2]), (int, [1, '2']),
+                                  (int, [1, True]), (int, [1, 2.0]), (int, ['1', 'x'])):
+            python = Params(v=param_type, v__many=True)
+            numpy_ = Params(v=param_type, v__many=True, v__vectorize=True)
+            for size in (vectorized.MIN_SIZE - 1, vectorized.MIN_SIZE, vectorized.MIN_SIZE * 4):
+                values = (mixed * size)[:size]
+                expected, = python.validate_many([{'v': values}])
+                result, = numpy_.validate_many([{'v': values}])
+                self.assertEqual(result.error, expected.error, (param_type, mixed, size))
+                self.assertEqual(result.data, expected.data, (param_type, mixed, size))
+                if result.data is not None:
+                    self.assertEqual([type(v) for v in result.data['v']],
+                                     [type(v) for v in expected.data['v']])
+
+    def test_validate_many(self):
+        """ Test bulk validation of plain dicts """
+        params = Params(id=int, id__optional=False, tags=str, tags__many=True, score=float, score__default=0.0)
+        records = [{'id': '1', 'tags': ['a']}, {'id': 'x'}, {}, {'id': 3, 'score': 1.5}]
+
+        results = params.validate_many(records)
+        self.assertEqual(results[0].data, {'id': 1, 'tags': ['a'], 'score': 0.0})
+        self.assertIsNone(results[0].error)
+        self.assertIsNone(results[1].data)
+        self.assertIn('id', results[1].error)
+        self.assertEqual(results[2].error, '缺少参数 id')
+        self.assertEqual(results[3].data['score'], 1.5)
+
+        self.assertEqual(params.validate_many(records, chunk_size=3, max_workers=2), results)
+
+    def test_async_view(self):
+        """ Test that coroutine views are validated and awaited """
+        import asyncio
+        from inspect import iscoroutinefunction
+
+        @Params(my_int=int, my_int__optional=False)
+        async def my_request(request, *args, **kwargs):
+            return Response({'my_int': kwargs['my_int']})
+
+        self.assertTrue(iscoroutinefunction(my_request))
+        response = asyncio.run(my_request(self.make_fake_request(get={'my_int': '3'})))
+        self.assertEqual(response.data, {'my_int': 3})
+        with self.assertRaises(ParamsErrorException):
+            asyncio.run(my_request(self.make_fake_request(get={})))
+
+    def test_view_mixin(self):
+        """ Test per-action specs declared on a view class """
+
+        class BaseView(object):
+            def initial(self, request, *args, **kwargs):
+                pass
+
+        class MyViewSet(ParamsViewMixin, BaseView):
+            action_params = {
+                'list': dict(page=int, page__default=1),
+                'get': Params(my_int=int, my_int__optional=False),
+            }
+
+        class MyChildViewSet(MyViewSet):
+            action_params = {
+                'list': dict(size=int, size__default=10),
+            }
+
+        self.assertIsInstance(MyViewSet.params_plans['list'], Params)
+        self.assertEqual(set(MyChildViewSet.params_plans), {'list', 'get'})
+
+        view = MyChildViewSet()
+        view.action = 'list'
+        view.kwargs = {'pk': '1'}
+        view.initial(self.make_fake_request(get={}))
+        self.assertEqual(view.kwargs, {'pk': '1', 'size': 10})
+
+        view = MyViewSet()
+        view.kwargs = {}
+        view.initial(self.make_fake_request(get={'my_int': '5'}))
+        self.assertEqual(view.kwargs, {'my_int': 5})
+        with self.assertRaises(ParamsErrorException):
+            view.initial(self.make_fake_request(get={}))
+
+    def test_core_without_django(self):
+        """ Test that the core validates without importing Django or DRF """
+        import os
+        import subprocess
+        code = '\n'.join([
+            'import sys',
+            'from django_params_validator.core import Params, ParamsError',
+            'assert Params(page=int).validate({"page": "2"}) == {"page": 2}',
+            'try:',
+            '    Params(page=int).validate({"page": "x"})',
+            'except ParamsError as e:',
+            '    assert "page" in e.message',
+            'assert not [m for m in sys.modules if m.split(".")[0] in ("django", "rest_framework")]',
+        ])
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        subprocess.check_call([sys.executable, '-c', code], cwd=root)
+        self.assertTrue(issubclass(ParamsErrorException, ParamsError))
+
+    def test_import_time(self):
+        """ Test that importing the package stays within the import-time budget """
+        import os
+        import subprocess
+        import tempfile
+        code = '\n'.join([
+            'from time import perf_counter',
+            'start = perf_counter()',
+            'import django_params_validator',
+            'print(perf_counter() - start)',
+        ])
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        # 和部署时一样使用编译好的 .pyc, 第一次运行时写入
+        env = dict(os.environ)
+        env.pop('PYTHONDONTWRITEBYTECODE', None)
+        with tempfile.TemporaryDirectory() as prefix:
+            command = [sys.executable, '-X', 'pycache_prefix=' + prefix, '-c', code]
+            subprocess.check_output(command, cwd=root, env=env)
+            seconds = min(float(subprocess.check_output(command, cwd=root, env=env)) for _ in range(5))
+        self.assertLess(seconds, IMPORT_BUDGET)
+
+    def test_instrumentation(self):
+        """ Test per-param latency, failure and size measurements """
+        sink = instrumentation.InMemorySink()
+        instrumentation.set_sink(sink)
+        try:
+            @Params(ids=int, ids__many=True, page=int, page__optional=False)
+            def my_request(request, *args, **kwargs):
+                return Response({'status': 'success'})
+
+            @Params(_instrument=False, page=int)
+            def not_instrumented(request, *args, **kwargs):
+                return Response({'status': 'success'})
+
+            self.do_fake_request(my_request, method_='POST', post={'ids': [1, 2, 3], 'page': 1})
+            self.do_fake_request(my_request, method_='POST', post={'ids': [1]}, expected_status=False)
+            self.do_fake_request(my_request, method_='POST', post={'ids': ['x'], 'page': 1}, expected_status=False)
+            self.do_fake_request(not_instrumented, get={'page': '1'})
+        finally:
+            instrumentation.set_sink(None)
+
+        endpoint = my_request.__module__ + '.' + my_request.__qualname__
+        self.assertEqual(set(e for e, p in sink.latency), {endpoint})
+        self.assertEqual(sink.latency[(endpoint, None)].count, 3)
+        # 必填的 page 先校验, 缺少 page 的请求不再校验 ids
+        self.assertEqual(sink.latency[(endpoint, 'ids')].count, 2)
+        self.assertEqual(sink.failures, {(endpoint, 'page', 'missing'): 1, (endpoint, 'ids', 'type'): 1,
+                                         (endpoint, None, 'missing'): 1, (endpoint, None, 'type'): 1})
+        self.assertEqual(sink.sizes[(endpoint, 'ids')].sum, 3)
+        self.assertIn('params_validation_failures_total{endpoint="%s",param="page",error="missing"} 1' % endpoint,
+                      sink.render_prometheus())
+
+    def test_instrumentation_composes(self):
+        """ Test that instrumentation keeps the adaptive order and collect_errors """
+        sink = instrumentation.InMemorySink()
+        instrumentation.set_sink(sink)
+        try:
+            adaptive = Params(_order='adaptive', _name='adaptive', ids=int, ids__many=True, page=int)
+            adaptive.adaptive.interval = 10
+            for i in range(20):
+                with self.assertRaises(ParamsErrorException):
+                    adaptive.validate({'page': 1, 'ids': ['x']})
+            collect = Params(_collect_errors=True, _name='collect', page=int, size=int)
+            with self.assertRaises(ParamsErrorException) as cm:
+                collect.validate({'page': 'x', 'size': 'y'})
+        finally:
+            instrumentation.set_sink(None)
+        self.assertEqual(adaptive.adaptive.requests, 20)
+        self.assertEqual(adaptive.adaptive.checks[adaptive.adaptive.order[0]][0].param_name, 'ids')
+        self.assertEqual(sink.latency[('adaptive', None)].count, 20)
+        self.assertEqual(sink.failures[('adaptive', 'ids', 'type')], 20)
+        self.assertEqual([e.param for e in cm.exception.errors], ['page', 'size'])
+        self.assertEqual(sink.failures[('collect', None, 'multiple')], 1)
+        self.assertEqual(sink.latency[('collect', 'size')].count, 1)
+
+    def test_structured_errors(self):
+        """ Test that errors carry structured data and render their message lazily """
+        for compile_ in (True, False):
+            params = Params(size=int, size__lte=100, _compile=compile_)
+            with self.assertRaises(ParamsErrorException) as cm:
+                params.validate({'size': 101})
+            e = cm.exception
+            self.assertEqual((e.param, e.code, e.expected, e.received), ('size', 'range', ('lte', 100), 101))
+            self.assertIsNotNone(e.template_args)
+            self.assertEqual(e.message, 'size 应该小于等于 100')
+            self.assertEqual(str(e), '请求参数错误')
+
+    def test_collect_errors(self):
+        """ Test that collect_errors reports every invalid param at once """
+        for compile_ in (True, False):
+            @Params(a=int, a__optional=False, b=('x', 'y'), c=int, c__default=1, _collect_errors=True,
+                    _compile=compile_)
+            def my_request(request, *args, **kwargs):
+                return Response(kwargs)
+
+            self.assertEqual(self.do_fake_request(my_request, get={'a': '1', 'b': 'x'}), {'a': 1, 'b': 'x', 'c': 1})
+            with override_settings(DEBUG=True):
+                with self.assertRaises(ParamsErrorException) as cm:
+                    my_request(self.make_fake_request(get={'b': 'z', 'c': 'q'}))
+            e = cm.exception
+            self.assertEqual(e.code, 'multiple')
+            self.assertEqual([(i.param, i.code) for i in e.errors], [('a', 'missing'), ('b', 'choices'), ('c', 'type')])
+            self.assertEqual(set(e.detail), {'a', 'b', 'c'})
+
+    def test_choices_index(self):
+        """ Test set/large choices and unhashable values against the hashed index """
+        for compile_ in (True, False):
+            @Params(color={'red', 'green'}, ids=int, ids__many=True, ids__choices=list(range(10000)),
+                    _compile=compile_)
+            def my_request(request, *args, **kwargs):
+                return Response(kwargs)
+
+            result = self.do_fake_request(my_request, method_='POST', post={'color': 'red', 'ids': ['1', 9999]})
+            self.assertEqual(result, {'color': 'red', 'ids': [1, 9999]})
+            self.do_fake_request(my_request, method_='POST', post={'ids': [10000]}, expected_status=False)
+            self.do_fake_request(my_request, method_='POST', post={'color': 'blue'}, expected_status=False)
+
+    def test_choice_source(self):
+        """ Test lazily loaded choices with ttl and refresh """
+        loads = []
+
+        def load_regions():
+            loads.append(1)
+            return [1, 2, 3] if len(loads) == 1 else [4]
+
+        for compile_ in (True, False):
+            del loads[:]
+            source = ChoiceSource(load_regions, ttl=3600, param_type=int)
+
+            @Params(region=source, _compile=compile_)
+            def my_request(request, *args, **kwargs):
+                return Response(kwargs)
+
+            self.assertEqual(loads, [])
+            self.assertEqual(self.do_fake_request(my_request, get={'region': '2'}), {'region': 2})
+            self.do_fake_request(my_request, get={'region': '4'}, expected_status=False)
+            self.assertEqual(len(loads), 1)
+            source.refresh()
+            self.assertEqual(self.do_fake_request(my_request, get={'region': '4'}), {'region': 4})
+
+        @Params(sku=str, sku__choices=lambda: ['a', 'b'])
+        def my_request2(request, *args, **kwargs):
+            return Response(kwargs)
+
+        self.assertEqual(self.do_fake_request(my_request2, get={'sku': 'b'}), {'sku': 'b'})
+        self.do_fake_request(my_request2, get={'sku': 'c'}, expected_status=False)
+
+        # 声明的类型不被 callable 选项覆盖, 类型写在选项前后都一样
+        for spec in (dict(region=int, region__choices=lambda: [1, 2, 3]),
+                     dict(region__choices=lambda: [1, 2, 3], region=int)):
+            for compile_ in (True, False):
+                params = Params(_compile=compile_, **spec)
+                self.assertEqual(params.validate({'region': '2'}), {'region': 2})
+                self.assertRaises(ParamsError, params.validate, {'region': '4'})
+
+    def test_choice_snapshot(self):
+        """ Test the shared mmap snapshot of a choice source """
+        import os
+        import tempfile
+
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, 'skus.choices')
+            source = ChoiceSource(lambda: ['b', 'a', 'ccc', 'a'], snapshot=path)
+
+            @Params(sku=source)
+            def my_request(request, *args, **kwargs):
+                return Response(kwargs)
+
+            self.assertEqual(self.do_fake_request(my_request, get={'sku': 'ccc'}), {'sku': 'ccc'})
+            self.do_fake_request(my_request, get={'sku': 'cc'}, expected_status=False)
+            self.do_fake_request(my_request, get={'sku': 'cccc'}, expected_status=False)
+            # 其它进程打开同一个快照, 不再调用 loader
+            index = SnapshotIndex.open_or_create(path, lambda: self.fail('loader called'))
+            self.assertEqual(list(index), ['a', 'b', 'ccc'])
+            self.assertIn('a', index)
+            index.mm.close()
+            source.index().mm.close()
+
+    def test_model_params(self):
+        """ Test that model params are resolved with one batched query """
+        alice = _MockUser.objects.create(name='alice')
+        bob = _MockUser.objects.create(name='bob')
+
+        for compile_ in (True, False):
+            @Params(user=_MockUser, users=_MockUser, users__many=True, owner=_MockUser, owner__field='name',
+                    owner__only=('name',), _compile=compile_)
+            def my_request(request, *args, **kwargs):
+                self.assertIs(kwargs['user'], alice)
+                self.assertEqual(kwargs['users'], [bob, alice, bob])
+                self.assertIs(kwargs['owner'], bob)
+                return Response({'status': 'success'})
+
+            _MockUserManager.queries = 0
+            self.do_fake_request(my_request, method_='POST', post={
+                'user': str(alice.id), 'users': [bob.id, alice.id, bob.id], 'owner': 'bob'})
+            # pk 和 name 各一次查询
+            self.assertEqual(_MockUserManager.queries, 2)
+
+            with override_settings(DEBUG=True):
+                with self.assertRaises(ParamsErrorException) as cm:
+                    my_request(self.make_fake_request('POST', post={'users': [alice.id, 998, 999], 'owner': 'eve'}))
+            e = cm.exception
+            self.assertEqual([(i.param, i.code, i.received) for i in e.errors],
+                             [('users', 'not_found', [998, 999]), ('owner', 'not_found', ['eve'])])
+
+    def test_model_identity_cache(self):
+        """ Test that stacked Params share the instances fetched for one request """
+        carol = _MockUser.objects.create(name='carol')
+
+        @Params(author=_MockUser, author__field='name', _identity_cache=True)
+        @Params(editor=_MockUser, _identity_cache=True)
+        def my_request(request, *args, **kwargs):
+            self.assertIs(kwargs['author'], kwargs['editor'])
+            return Response({'status': 'success'})
+
+        _MockUserManager.queries = 0
+        self.do_fake_request(my_request, method_='POST', post={'author': 'carol', 'editor': carol.id})
+        self.assertEqual(_MockUserManager.queries, 1)
+
+    def test_model_bad_keys(self):
+        """ Test that malformed model keys are validation errors, not crashes """
+        user = _StrictUser.objects.create(name='dave')
+        params = Params(user=_StrictUser, users=_StrictUser, users__many=True, owner=_StrictUser,
+                        owner__field='name', _collect_errors=True)
+        self.assertIs(params.validate({'user': str(user.id)})['user'], user)
+        with self.assertRaises(ParamsError) as cm:
+            params.validate({'user': 'abc', 'users': [user.id, {'a': 1}]})
+        self.assertEqual([(e.param, e.code) for e in cm.exception.errors], [('user', 'type'), ('users', 'type')])
+        # to_python 接受, filter() 拒绝的 key 当作找不到
+        _StrictUser._meta.get_field = staticmethod(lambda name: _IntegerField())
+        try:
+            with self.assertRaises(ParamsError) as cm:
+                params.validate({'owner': '1'})
+        finally:
+            _StrictUser._meta.get_field = staticmethod(lambda name: _CharField())
+        self.assertEqual(cm.exception.code, 'not_found')
+
+    def test_json_array_reader(self):
+        """ Test that elements split across chunks are decoded whole """
+        import io
+        import json
+
+        items = [12345, -0.5, '中文,]', {'a': [1, 2]}, None, True, 6789]
+        body = json.dumps(items, ensure_ascii=False).encode('utf-8')
+        for chunk_size in (1, 3, 7, 1024):
+            reader = JsonArrayReader(io.BytesIO(body), chunk_size)
+            self.assertTrue(reader.start())
+            self.assertEqual(list(reader), items)
+        for body in (b'[1, 2', b'[1 2]', b'[1,]'):
+            reader = JsonArrayReader(io.BytesIO(body), 2)
+            reader.start()
+            self.assertRaises(ValueError, list, reader)
+        self.assertFalse(JsonArrayReader(io.BytesIO(b'  ')).start())
+        self.assertRaises(ValueError, JsonArrayReader(io.BytesIO(b'{}')).start)
+
+    def test_stream(self):
+        """ Test streaming validation of a JSON array request body """
+        import io
+
+        @Params(points=float, points__many=True, points__stream=True, points__item_gte=0, points__lte=3,
+                points__optional=False, source=str)
+        def my_request(request, *args, **kwargs):
+            return Response({'source': kwargs['source'], 'points': list(kwargs['points'])})
+
+        def stream_request(body):
+            request = self.make_fake_request('POST', get={'source': 'sensor'})
+            request.data = None  # 不应该读取 request.data
+            request.stream = io.BytesIO(body)
+            return request
+
+        response = my_request(stream_request(b'[1.0, "2.5", 3e0]'))
+        self.assertEqual(response.data, {'source': 'sensor', 'points': [1, 2.5, 3]})
+        with override_settings(DEBUG=True):
+            for body, label in ((b'[1.0, -1.0, 2.0]', 'points[1]'), (b'[1.0, 2.0, 3.0, 4.0]', 'points'), (b'[1.0, x]', 'points'),
+                                (b'{"points": []}', 'points'), (b'', 'points')):
+                with self.assertRaises(ParamsErrorException) as cm:
+                    my_request(stream_request(body))
+                self.assertEqual(cm.exception.param, label)
+
+        # 错误的元素在大的请求体前面时立即抛出, 不读完整个请求体
+        body = io.BytesIO(b'[1, x, ' + b'2, ' * 3000000 + b'2]')
+        reader = JsonArrayReader(body)
+        reader.start()
+        with self.assertRaises(ValueError):
+            list(reader)
+        self.assertLess(body.tell(), 2 * 64 * 1024)
+        self.assertLess(len(reader.buf), 2 * 64 * 1024)
+        # 被分块截断的字符串, 字面量和数字仍然可以解析
+        body = b'["abcdef", true, false, null, -12.5e3, {"a": [1, 2]}]'
+        reader = JsonArrayReader(io.BytesIO(body), chunk_size=3)
+        reader.start()
+        self.assertEqual(list(reader), ['abcdef', True, False, None, -12.5e3, {'a': [1, 2]}])
+        # 超过 max_element_size 的元素
+        reader = JsonArrayReader(io.BytesIO(b'["' + b'a' * 1000 + b'"]'), chunk_size=16, max_element_size=100)
+        reader.start()
+        with self.assertRaises(ValueError):
+            list(reader)
+
+    def test_memoize(self):
+        """ Test LRU memoization of GET validation results """
+        from django.http import QueryDict
+
+        params = Params(page=int, page__default=1, tags=str, tags__many=True, flag=bool, _memoize=2)
+        first = params.validate(QueryDict('tags=a&tags=b&flag=0&utm=x'), True)
+        self.assertEqual(first, {'page': 1, 'tags': ['a', 'b'], 'flag': False})
+        first['tags'].append('c')
+        # 没有声明的参数和空值不影响 key
+        self.assertEqual(params.validate(QueryDict('tags=a&tags=&tags=b&flag=0&page='), True, {'pk': 3}),
+                         {'page': 1, 'tags': ['a', 'b'], 'flag': False, 'pk': 3})
+        self.assertEqual(params.memo_info(), (1, 1, 2, 1))
+        params.validate(QueryDict('page=2'), True)
+        params.validate(QueryDict('page=3'), True)
+        self.assertEqual(params.memo_info().currsize, 2)
+        with self.assertRaises(ParamsErrorException):
+            params.validate(QueryDict('page=x'), True)
+        # POST 不缓存
+        self.assertEqual(params.validate({'page': 4}), {'page': 4, 'tags': [], 'flag': None})
+        self.assertEqual(params.memo_info().misses, 4)
+
+        self.assertIsNone(Params(user=_MockUser, _memoize=True).memo_info())
+        self.assertIsNone(Params(page=int).memo_info())
+
+    def test_canonical_key(self):
+        """ Test that equivalent requests get the same params key """
+        params = Params(page=int, page__default=1, flag=bool, tags=str, tags__many=True, _canonical_key=True)
+        keys = set()
+        for get in ({'flag': '0', 'page': '1'}, {'page': '', 'flag': 'false'}, {'flag': 'False', 'utm': 'x'}):
+            request = self.make_fake_request(get=get)
+            params.check_request(request, {'pk': 3})
+            keys.add(request.params_key)
+        self.assertEqual(len(keys), 1)
+        request = self.make_fake_request(get={'flag': '1'})
+        params.check_request(request, {'pk': 3})
+        self.assertNotIn(request.params_key, keys)
+
+    @unittest.skipUnless(vectorized.import_numpy(), 'numpy is not installed')
+    def test_canonical_key_ndarray(self):
+        """ Test that large ndarrays are hashed by all their elements """
+        import numpy
+        from django_params_validator.cache import canonical_key
+        a, b = numpy.arange(2000), numpy.arange(2000)
+        b[1000] = -1
+        self.assertNotEqual(canonical_key({'ids': a}), canonical_key({'ids': b}))
+        self.assertEqual(canonical_key({'ids': a}), canonical_key({'ids': list(range(2000))}))
+
+    def test_cache_response(self):
+        """ Test whole-response caching and If-None-Match """
+        calls = []
+
+        @Params(page=int, page__default=1, _cache_response=60)
+        def my_request(request, *args, **kwargs):
+            calls.append(kwargs['page'])
+            return Response({'page': kwargs['page']})
+
+        first = my_request(self.make_fake_request(get={'page': '1'}))
+        etag = first['ETag']
+        second = my_request(self.make_fake_request(get={}))
+        self.assertEqual((second.data, second['ETag']), ({'page': 1}, etag))
+        self.assertEqual(calls, [1])
+
+        request = self.make_fake_request(get={'page': '1'})
+        request.META = {'HTTP_IF_NONE_MATCH': 'W/%s, "other"' % etag}
+        self.assertEqual(my_request(request).status_code, 304)
+        self.assertEqual(my_request(self.make_fake_request(get={'page': '2'})).data, {'page': 2})
+        my_request(self.make_fake_request('POST', post={'page': 2}))
+        self.assertEqual(calls, [1, 2, 2])
+
+    def test_order(self):
+        """ Test cost-based and adaptive ordering of the checks """
+        spec = dict(ids=int, ids__many=True, day=Params.DATETIME_STR, color=('red', 'blue'), page=int,
+                    size=int, size__optional=False)
+        self.assertEqual(list(Params(**spec)._validators), ['size', 'page', 'color', 'day', 'ids'])
+        self.assertEqual(list(Params(_order='declared', **spec)._validators), ['ids', 'day', 'color', 'page', 'size'])
+        self.assertRaises(ValueError, Params, _order='random', **spec)
+
+        params = Params(_order='adaptive', **spec)
+        params.adaptive.interval = 10
+        for i in range(100):
+            with self.assertRaises(ParamsErrorException):
+                params.validate({'size': 1, 'page': 1, 'color': 'red', 'day': '2018-10-10 08:00:00', 'ids': ['x']})
+        # ids 总是失败, 调整到最前面
+        self.assertEqual(params.adaptive.checks[params.adaptive.order[0]][0].param_name, 'ids')
+        self.assertEqual(params.validate({'size': 1}), {'size': 1, 'page': None, 'color': None, 'day': None, 'ids': []})
+
+    def test_custom_validators(self):
+        """ Test sync and async validator callables running concurrently """
+        import asyncio
+        import time
+
+        def slow_positive(value):
+            time.sleep(0.2)
+            if value <= 0:
+                raise ValueError('not positive')
+
+        async def slow_upper(value):
+            await asyncio.sleep(0.2)
+            return [v.upper() for v in value]
+
+        for compile_ in (True, False):
+            params = Params(a=int, a__validator=slow_positive, b=int, b__validator=slow_positive,
+                            tags=str, tags__many=True, tags__validator=slow_upper, c=int, _compile=compile_)
+            start = time.time()
+            self.assertEqual(params.validate({'a': 1, 'b': 2, 'tags': ['x']}), {'a': 1, 'b': 2, 'tags': ['X'], 'c': None})
+            self.assertLess(time.time() - start, 0.35)
+            with self.assertRaises(ParamsErrorException) as cm:
+                params.validate({'a': -1, 'b': 0})
+            self.assertEqual([(e.param, e.code) for e in cm.exception.errors], [('a', 'invalid'), ('b', 'invalid')])
+            self.assertEqual(cm.exception.errors[0].message, 'a 不合法: not positive')
+
+        @Params(a=int, a__validator=slow_positive, tags=str, tags__many=True, tags__validator=slow_upper)
+        async def my_request(request, *args, **kwargs):
+            return Response(kwargs)
+
+        start = time.time()
+        response = asyncio.run(my_request(self.make_fake_request('POST', post={'a': 1, 'tags': ['y']})))
+        self.assertEqual(response.data, {'a': 1, 'tags': ['Y']})
+        self.assertLess(time.time() - start, 0.35)
+        with self.assertRaises(ParamsErrorException):
+            asyncio.run(my_request(self.make_fake_request('POST', post={'a': -1})))
+
+    def test_validator_cache(self):
+        """ Test ttl caching of validator results, including negative results """
+        import time
+        calls = []
+
+        def known_tenant(value):
+            calls.append(value)
+            if value > 100:
+                raise ValueError('unknown tenant')
+            return value * 10
+
+        for backend in (None, 'default'):
+            del calls[:]
+            params = Params(tenant=int, tenant__validator=known_tenant, tenant__cache_ttl=60,
+                            tenant__cache_negative_ttl=0.05, tenant__cache_backend=backend)
+            for i in range(3):
+                self.assertEqual(params.validate({'tenant': '7'}), {'tenant': 70})
+                self.assertRaises(ParamsErrorException, params.validate, {'tenant': 101})
+            self.assertEqual(calls, [7, 101])
+            time.sleep(0.1)
+            self.assertRaises(ParamsErrorException, params.validate, {'tenant': 101})
+            self.assertEqual(params.validate({'tenant': 7}), {'tenant': 70})
+            self.assertEqual(calls, [7, 101, 101])
+
+        params = Params(tenant=int, tenant__validator=known_tenant, tenant__cache_ttl=60, tenant__cache_size=1)
+        params.validate({'tenant': 1})
+        params.validate({'tenant': 2})
+        self.assertEqual(params._validators['tenant'].result_cache.info().currsize, 1)
+
+        # 共享缓存中不同的 lambda 不能使用同样的 key
+        self.assertRaises(TypeError, Params, code=int, code__validator=lambda v: v, code__cache_ttl=60,
+                          code__cache_backend='default')
+        double = Params(code=int, code__validator=lambda v: v * 2, code__cache_ttl=60, code__cache_backend='default',
+                        code__cache_key_prefix='double')
+        triple = Params(code=int, code__validator=lambda v: v * 3, code__cache_ttl=60, code__cache_backend='default',
+                        code__cache_key_prefix='triple')
+        self.assertEqual(double.validate({'code': 5}), {'code': 10})
+        self.assertEqual(triple.validate({'code': 5}), {'code': 15})
+
+    def test_limits(self):
+        """ Test max_length/max_items checked on the raw value, and defaults from settings """
+        from django.http import QueryDict as DjangoQueryDict
+        for compile_ in (True, False):
+            params = Params(n=int, n__max_length=5, ids=int, ids__many=True, ids__max_items=3, ids__max_length=2,
+                            _compile=compile_)
+            self.assertEqual(params.validate({'n': '12345', 'ids': ['1', 22]}), {'n': 12345, 'ids': [1, 22]})
+            for data, label, received in (({'n': '9' * 100000}, 'n', 100000), ({'ids': list(range(10))}, 'ids', 10),
+                                          ({'ids': ['1', '123']}, 'ids[1]', 3), ({'ids': '1' * 200000}, 'ids', 200000),
+                                          ({'ids': dict((str(i), i) for i in range(1000))}, 'ids', 1000)):
+                with self.assertRaises(ParamsErrorException) as cm:
+                    params.validate(data)
+                self.assertEqual((cm.exception.code, cm.exception.param, cm.exception.received),
+                                 ('limit', label, received))
+            # GET 中逗号分隔的值最多分隔 max_items + 1 个
+            csv = Params(ids=int, ids__many=True, ids__max_items=3, _compile=compile_)
+            self.assertEqual(csv.validate(DjangoQueryDict('ids=1,,2,3,'), True), {'ids': [1, 2, 3]})
+            with self.assertRaises(ParamsErrorException) as cm:
+                csv.validate(DjangoQueryDict('ids=' + '1,' * 100000), True)
+            self.assertEqual((cm.exception.code, cm.exception.received), ('limit', 4))
+            with self.assertRaises(ParamsErrorException) as cm:
+                csv.validate(DjangoQueryDict('ids=1,,,2,3,4'), True)
+            self.assertEqual((cm.exception.code, cm.exception.received), ('limit', 4))
+
+        class QueryDict(dict):
+            def getlist(self, key, default=None):
+                return self.get(key, default)
+
+        with override_settings(PARAMS_VALIDATOR_MAX_LENGTH=3, PARAMS_VALIDATOR_MAX_ITEMS=2):
+            params = Params(s=str, tags=str, tags__many=True, other=str, other__max_length=10)
+        self.assertRaises(ParamsErrorException, params.validate, {'s': 'abcd'})
+        self.assertRaises(ParamsErrorException, params.validate, QueryDict(tags=['a', '', 'b']), True)
+        self.assertEqual(params.validate({'other': 'abcd'})['other'], 'abcd')
+
+        # 进程池的子进程读不到 settings, 使用构造时的默认值
+        records = [{'s': 'abcd'}, {'tags': ['a', 'b', 'c']}, {'s': 'abc', 'other': 'abcd'}]
+        results = params.validate_many(records)
+        self.assertEqual([r.error is None for r in results], [False, False, True])
+        self.assertEqual(params.validate_many(records, chunk_size=1, max_workers=2), results)
+
+    def test_many_csv_and_array(self):
+        """ Test comma separated GET values and array.array output """
+        from array import array
+        from django.http import QueryDict
+
+        for compile_ in (True, False):
+            params = Params(ids=int, ids__many=True, ids__array=True, ids__max_items=4, tags=str, tags__many=True,
+                            names=str, names__many=True, names__separator=',', _compile=compile_)
+            result = params.validate(QueryDict('ids=1,2&ids=3&ids=&tags=a,b&names=x,y&names=z'), True)
+            self.assertEqual(result, {'ids': array('q', [1, 2, 3]), 'tags': ['a,b'], 'names': ['x', 'y', 'z']})
+            self.assertEqual(params.validate({'ids': [4, 5]})['ids'], array('q', [4, 5]))
+            with self.assertRaises(ParamsErrorException) as cm:
+                params.validate(QueryDict('ids=1,2,3&ids=4,5'), True)
+            self.assertEqual(cm.exception.code, 'limit')
+            with self.assertRaises(ParamsErrorException) as cm:
+                params.validate(QueryDict('ids=1,x'), True)
+            self.assertEqual(cm.exception.param, 'ids[1]')
+
+        self.assertRaises(TypeError, Params, ids=str, ids__many=True, ids__array=True)
+
+    def test_validator_spec(self):
+        """ Test that validator specs are immutable, checked and shared """
+        a = Params(page=int, page__default=1, size=int, ids=int, ids__many=True, ids__choices=[1, 2])
+        b = Params(page=int, page__default=1, size=int, ids=int, ids__choices=[1, 2], ids__many=True)
+        for name in ('page', 'size', 'ids'):
+            self.assertIs(a._validators[name], b._validators[name])
+        self.assertIs(a._compiled, b._compiled)
+        # 相等和 hash 一致
+        self.assertEqual(len(set(a._validators.values()) | set(b._validators.values())), 3)
+        self.assertNotEqual(a._validators['page'], 'page')
+        self.assertIsNot(Params(page=int, page__default=True)._validators['page'], a._validators['page'])
+        with self.assertRaises(AttributeError):
+            a._validators['page'].default = 2
+        with self.assertRaises(AttributeError):
+            a._validators['page'].other = 2
+        with self.assertRaises(TypeError):
+            Params(page=int, page__defualt=1)
+        with self.assertRaises(TypeError):
+            Params(page=int, page__default__x=1)
+
+        # 不能 intern 的声明每次都是新的 validator, 编译结果不进入共享的缓存
+        size = len(Params._compiled_cache)
+        for i in range(100):
+            params = Params(meta=dict, meta__default={}, page=int)
+            self.assertIsNotNone(params._compiled)
+            self.assertEqual(params.validate({'page': '1'}), {'meta': {}, 'page': 1})
+        self.assertLessEqual(len(Params._compiled_cache), size + 1)
+
+    def test_defer(self):
+        import types
+        from io import StringIO
+        from django.core.management import call_command
+        from django.urls import path
+        from rest_framework.decorators import api_view
+        from django_params_validator.core import DeferredParams
+        from django_params_validator.management.commands.warmup_params import Command
+        from django_params_validator.warmup import warm_up
+
+        params = Params(page=int, page__gte=1, _defer=True)
+        self.assertNotIn('_validators', params.__dict__)
+        self.assertEqual(params.validate({'page': 2}), {'page': 2})
+        self.assertIn('_validators', params.__dict__)
+        # 构造过程中其它线程等待构造完成
+        import threading
+        import time
+
+        class Slow(Params):
+            def _build(self):
+                time.sleep(0.05)
+                Params._build(self)
+
+        slow = Slow(page=int, _defer=True, _memoize=True)
+        errors = []
+
+        def use(f):
+            try:
+                f()
+            except Exception as e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=use, args=(lambda: slow.validate({'page': '3'}),)),
+                   threading.Thread(target=use, args=(lambda: slow._compiled,))]
+        threads[0].start()
+        time.sleep(0.01)
+        threads[1].start()
+        for t in threads:
+            t.join()
+        self.assertEqual(errors, [])
+        self.assertIs(type(slow), Slow)
+        self.assertEqual(slow.validate(self.make_fake_request(get={'page': '4'}).GET, True), {'page': 4})
+        # 错误的声明在第一次使用时才报告
+        bad = Params(ids=str, ids__array=True, _defer=True)
+        with self.assertRaises(TypeError):
+            bad.validate({})
+        with override_settings(PARAMS_VALIDATOR_DEFER=True):
+            deferred = Params(page=int)
+        self.assertIsInstance(deferred, DeferredParams)
+        self.assertIsNotNone(deferred._compiled)
+        self.assertIs(type(deferred), Params)
+
+        @api_view(['GET'])
+        @Params(page=int, page__gte=1, color=('red', 'blue'), size=float, size__gt=0, size__lt=1, _defer=True)
+        def books(request, *args, **kwargs):
+            return Response(kwargs)
+
+        @Params(page=int, page__default=0, page__gte=1, _defer=True)
+        def authors(request, *args, **kwargs):
+            return Response(kwargs)
+
+        urls = types.ModuleType('warmup_urls')
+        urls.urlpatterns = [path('books/', books), path('authors/', authors)]
+        reports = dict((r.route, r) for r in warm_up(urls, number=10))
+        self.assertEqual(reports['books/'].params, 3)
+        self.assertTrue(reports['books/'].compiled)
+        self.assertEqual(reports['books/'].problems, [])
+        self.assertGreater(reports['books/'].seconds, 0)
+        # default 不满足 gte
+        self.assertEqual(len(reports['authors/'].problems), 1)
+        self.assertIsNone(reports['authors/'].seconds)
+        self.assertIs(type(authors.params), Params)
+
+        out = StringIO()
+        call_command(Command(), urlconf=urls, number=10, stdout=out)
+        self.assertIn('2 Params, 1 problems', out.getvalue())
+
+        # number=0 只构造, 不测量
+        self.assertIsNone(warm_up(urls)[0].seconds)
+        out = StringIO()
+        call_command(Command(), urlconf=urls, number=0, stdout=out)
+        self.assertIn('2 Params, 1 problems', out.getvalue())
+
+    def test_replay(self):
+        import json
+        import os
+        import tempfile
+        import types
+        from io import StringIO
+        from django.core.management import call_command
+        from django.urls import path
+        from rest_framework.decorators import api_view
+        from rest_framework.views import APIView
+        from django_params_validator.management.commands.replay_params import Command
+        from django_params_validator.replay import replay
+
+        @api_view(['GET'])
+        @Params(page=int, page__gte=1, ids=int, ids__many=True, _name='books')
+        def books(request, *args, **kwargs):
+            return Response(kwargs)
+
+        class AuthorView(ParamsViewMixin, APIView):
+            action_params = {'post': dict(name=str, name__optional=False, _name='author')}
+
+        urls = types.ModuleType('replay_urls')
+        urls.urlpatterns = [path('books/', books), path('authors/<int:pk>/', AuthorView.as_view())]
+        sys.modules['replay_urls'] = urls
+        self.addCleanup(sys.modules.pop, 'replay_urls')
+        lines = [
+            {'method': 'GET', 'path': '/books/?page=2&ids=1,2,3'},
+            {'method': 'GET', 'path': '/books/', 'query': {'page': '0'}},
+            {'method': 'POST', 'path': '/authors/1/', 'body': {'name': 'x'}},
+            {'method': 'GET', 'path': '/nowhere/'},
+        ]
+        har = {'log': {'entries': [
+            {'request': {'method': 'POST', 'url': 'http://testserver/authors/2/',
+                         'postData': {'mimeType': 'application/x-www-form-urlencoded', 'text': 'name=y'}}},
+            {'request': {'method': 'GET', 'url': 'http://testserver/books/?page=3'}},
+        ]}}
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        directory = tmp.name
+        jsonl_path = os.path.join(directory, 'traffic.jsonl')
+        har_path = os.path.join(directory, 'traffic.har')
+        with open(jsonl_path, 'w') as f:
+            f.write('\n'.join(json.dumps(line) for line in lines))
+        with open(har_path, 'w') as f:
+            json.dump(har, f)
+
+        stats = replay(jsonl_path, urls, repeat=2)
+        self.assertEqual((len(stats.samples), stats.unresolved, stats.failures), (6, 2, 2))
+        endpoints = dict((s.name, s) for s in stats.endpoints())
+        self.assertEqual(endpoints['GET books/'].count, 4)
+        self.assertEqual(endpoints['GET books/'].failures, 2)
+        self.assertEqual(endpoints['POST authors/<int:pk>/'].count, 2)
+        self.assertEqual(set(s.name for s in stats.params()), {('books', 'page'), ('books', 'ids'), ('author', 'name')})
+        self.assertGreater(stats.percentiles()[99], 0)
+
+        stats = replay(har_path, 'replay_urls', max_workers=2, chunk_size=1)
+        self.assertEqual((len(stats.samples), stats.unresolved, stats.failures), (2, 0, 0))
+
+        out = StringIO()
+        call_command(Command(), har_path, urlconf=urls, stdout=out)
+        self.assertIn('2 requests, 0 unresolved, 0 rejected', out.getvalue())
+        self.assertIn('slowest params:', out.getvalue())
+
+    def test_source(self):
+        """ Test that each param is read from its declared source and request.data is only read when needed """
+        request = self.make_fake_request('DELETE', get={'dry_run': 'true'})
+        type(request).data = property(lambda r: self.fail('request.data should not be read'))
+        self.addCleanup(delattr, type(request), 'data')
+        request.META = {'HTTP_X_REQUEST_ID': 'abc'}
+        request.COOKIES = {'session': 's1'}
+
+        @Params(pk=int, pk__source='path', dry_run=bool, dry_run__source='query',
+                x_request_id=str, x_request_id__source='header', session=str, session__source='cookie')
+        def delete(request, *args, **kwargs):
+            return Response(kwargs)
+
+        self.assertEqual(delete(request, pk='5').data,
+                         {'pk': 5, 'dry_run': True, 'x_request_id': 'abc', 'session': 's1'})
+        with self.assertRaises(ParamsErrorException) as cm:
+            delete(request, pk='x')
+        self.assertEqual(cm.exception.param, 'pk')
+
+        @Params(ids=int, ids__many=True, ids__source='body', page=int, page__source='query', name=str)
+        def update(request, *args, **kwargs):
+            return Response(kwargs)
+
+        request = self.make_fake_request('POST', get={'page': '2'}, post={'ids': [1, 2], 'name': 'x'})
+        self.assertEqual(update(request).data, {'ids': [1, 2], 'page': 2, 'name': 'x'})
+        # 没有声明 source 的参数在 GET 请求中从 query 获取
+        request = self.make_fake_request('GET', get={'page': '2', 'name': 'y'})
+        self.assertEqual(update(request).data, {'ids': [], 'page': 2, 'name': 'y'})
+        with self.assertRaises(TypeError):
+            Params(page=int, page__source='form')
+
+    def test_async_django_view(self):
+        """ Test coroutine views receiving a plain Django HttpRequest """
+        import asyncio
+        import json
+        from django.test import RequestFactory
+
+        @Params(page=int, page__optional=False, ids=int, ids__many=True)
+        async def my_request(request, *args, **kwargs):
+            return Response({'page': kwargs['page'], 'ids': kwargs['ids']})
+
+        factory = RequestFactory()
+        response = asyncio.run(my_request(factory.get('/books/', {'page': '2', 'ids': ['1', '3']})))
+        self.assertEqual(response.data, {'page': 2, 'ids': [1, 3]})
+        response = asyncio.run(my_request(factory.post('/books/', json.dumps({'page': 3, 'ids': [4]}),
+                                                       content_type='application/json')))
+        self.assertEqual(response.data, {'page': 3, 'ids': [4]})
+        response = asyncio.run(my_request(factory.post('/books/', {'page': '4'})))
+        self.assertEqual(response.data['page'], 4)
+        with self.assertRaises(ParamsErrorException):
+            asyncio.run(my_request(factory.post('/books/', 'not json', content_type='application/json')))
+
+    def test_async_view_models(self):
+        """ Test that model params of coroutine views are looked up outside the event loop """
+        import asyncio
+        user = _MockUser.objects.create(name='async')
+        in_loop = []
+        manager_filter = _MockUserManager.filter
+
+        def filter(manager, **kwargs):
+            try:
+                asyncio.get_running_loop()
+                in_loop.append(True)
+            except RuntimeError:
+                in_loop.append(False)
+            return manager_filter(manager, **kwargs)
+
+        @Params(user=_MockUser)
+        async def my_request(request, *args, **kwargs):
+            return Response({'name': kwargs['user'].name})
+
+        _MockUserManager.filter = filter
+        try:
+            response = asyncio.run(my_request(self.make_fake_request(get={'user': str(user.id)})))
+            with self.assertRaises(ParamsErrorException):
+                asyncio.run(my_request(self.make_fake_request(get={'user': '-1'})))
+        finally:
+            _MockUserManager.filter = manager_filter
+        self.assertEqual(response.data, {'name': 'async'})
+        self.assertEqual(in_loop, [False, False])
+
+    def test_unknown_option(self):
+        with self.assertRaises(TypeError):
+            Params(my_int=int, _no_such_option=True)
+
 
 if __name__ == '__main__':
     unittest.main()